@@ -1,443 +1,731 @@
-import os
-import base64
-import json
-import re
-from openai import OpenAI
-from typing import List, Dict, Optional, Tuple
-from graph_kb import GraphKnowledgeBase
-from graph_schema import ENTITY_TYPES, RELATION_TYPES
-
-
-class ErnieClient:
-    def __init__(self, 
-                 host: str = "0.0.0.0", 
-                 port: str = "8180", 
-                 model_name: str = "local-vl-model",
-                 graph_kb: Optional[GraphKnowledgeBase] = None):
-        """初始化本地化VL模型客户端，支持多模态输入"""
-        self.host = host
-        self.port = port
-        self.model_name = model_name
-        self.base_url = f"http://{host}:{port}/v1"
-        self.graph_kb = graph_kb
-        
-        self.client = OpenAI(
-            api_key="null",
-            base_url=self.base_url
-        )
-
-    def encode_image(self, image_path: str) -> str:
-        """图片转Base64编码"""
-        try:
-            with open(image_path, "rb") as image_file:
-                return base64.b64encode(image_file.read()).decode('utf-8')
-        except Exception as e:
-            raise Exception(f"图像编码失败: {str(e)}")
-
-    def chat_completion(self, messages: List[Dict], stream: bool = True) -> str:
-        """基础对话接口"""
-        try:
-            completion = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=messages,
-                stream=stream,
-                temperature=0.3
-            )
-            
-            if stream:
-                result = ""
-                for chunk in completion:
-                    if chunk.choices and chunk.choices[0].delta.content:
-                        result += chunk.choices[0].delta.content
-                return result
-            else:
-                return completion.choices[0].message.content
-        except Exception as e:
-            return f"模型请求失败: {str(e)}"
-
-    def text_generation(self, prompt: str, system_prompt: str = None) -> str:
-        """纯文本生成"""
-        messages = []
-        
-        if system_prompt:
-            messages.append({
-                "role": "system",
-                "content": system_prompt
-            })
-        
-        messages.append({
-            "role": "user",
-            "content": prompt
-        })
-        
-        return self.chat_completion(messages, stream=False)
-
-    def analyze_image_and_text(self, text: str = None, image_path: str = None) -> str:
-        """多模态分析（文本+图像）"""
-        if not text and not image_path:
-            return "请提供文本或图像进行分析"
-        
-        content = []
-        
-        if image_path:
-            try:
-                base64_image = self.encode_image(image_path)
-                content.append({
-                    "type": "image_url",
-                    "image_url": {
-                        "url": f"data:image/jpeg;base64,{base64_image}",
-                        "detail": "high"
-                    }
-                })
-            except Exception as e:
-                return f"图像处理失败: {str(e)}"
-        
-        if text:
-            content.append({
-                "type": "text",
-                "text": text
-            })
-        
-        messages = [{
-            "role": "user",
-            "content": content
-        }]
-        
-        return self.chat_completion(messages, stream=False)
-
-    def analyze_symptoms(self, text: str) -> List[str]:
-        """从自然语言文本中提取症状（优化版：严格限制只提取明确提到的症状）"""
-        prompt = f"""从以下医疗描述中提取关键症状，严格遵循：
-1. 仅提取文本中**明确提到**的症状，**绝对不添加任何未提及的症状**
-2. 使用标准医学术语（如用"发热"而非"身体热"，"咳嗽"而非"嗓子痒"）
-3. 仅返回Python字符串列表，无额外文本（例如：["发热", "干咳", "乏力"]）
-4. 最多提取8个最关键的症状（忽略无关描述）
-5. 排除疾病名称（如"流感"是疾病，"高热"是症状）
-6. 如果未提到任何症状，返回空列表[]
-
-患者描述：{text}
-
-直接返回症状列表（无需代码块）："""
-        
-        result = self.text_generation(prompt)
-        
-        try:
-            result = result.strip().replace("'", '"').replace("\n", "")
-            match = re.search(r'\[(.*?)\]', result)
-            if match:
-                symptoms = json.loads(f"[{match.group(1)}]")
-                # 额外过滤：只保留文本中明确出现的症状
-                filtered = []
-                for s in symptoms:
-                    # 处理同义词匹配（如"小红点"对应"皮疹"）
-                    synonyms = {
-                        "小红点": "皮疹",
-                        "痒": "瘙痒",
-                        "疼": "疼痛",
-                        "红点": "皮疹"
-                    }
-                    normalized = synonyms.get(s, s)
-                    # 检查原始文本是否包含该症状或其同义词
-                    if any(keyword in text for keyword in [s, normalized] + list(synonyms.keys())):
-                        filtered.append(normalized)
-                return list(set(filtered))  # 去重
-        except Exception as e:
-            print(f"症状解析错误: {e}")
-            return []
-        
-        return []
-
-    def extract_symptoms_from_multimodal(self, text: Optional[str] = None, image_path: Optional[str] = None) -> List[str]:
-        """从自然语言和图像中联合提取症状（优化版：增加交叉验证）"""
-        symptoms = []
-        
-        # 1. 从文本提取症状（作为基准）
-        text_symptoms = []
-        if text and text.strip():
-            text_symptoms = self.analyze_symptoms(text)
-            symptoms.extend(text_symptoms)
-            print(f"从文本提取症状：{text_symptoms}")
-        
-        # 2. 从图像提取症状（增加严格约束）
-        image_symptoms = []
-        if image_path:
-            try:
-                # 图像分析提示词优化：只描述可见特征，不推测未显示症状
-                image_analysis = self.medical_image_analysis(
-                    image_path,
-                    custom_prompt="""作为专业医疗影像分析师，请仅描述图像中**明确可见**的皮肤症状特征：
-1. 病灶形态（如：红色丘疹、斑疹、水疱）
-2. 颜色特征（如：红色、淡粉色）
-3. 分布情况（如：散在分布、局部聚集）
-4. 绝对不要添加任何图像中未显示的症状或进行疾病推测
-5. 用客观描述，避免主观判断"""
-                )
-                print(f"图像分析结果：{image_analysis[:100]}...")
-                
-                # 从图像分析中提取症状（严格模式）
-                prompt = f"""从以下图像分析结果中提取皮肤症状关键词，严格遵循：
-1. 仅提取**明确描述**的症状，不添加任何推测性症状
-2. 每个症状必须是图像中可见的（如"皮疹"、"红斑"）
-3. 仅返回Python列表，无额外文本
-4. 如果没有明确症状，返回空列表[]
-
-图像分析结果：{image_analysis}
-
-直接返回症状列表："""
-                image_symptoms = self.text_generation(prompt)
-                
-                # 解析并过滤图像症状
-                image_symptoms = image_symptoms.strip().replace("'", '"')
-                if image_symptoms.startswith("```"):
-                    image_symptoms = image_symptoms.split("```")[1].strip()
-                image_symptoms = json.loads(image_symptoms)
-                image_symptoms = [s for s in image_symptoms if isinstance(s, str) and s]
-                
-                print(f"从图像提取症状：{image_symptoms}")
-            except Exception as e:
-                print(f"图像症状提取失败：{e}")
-        
-        # 3. 交叉验证：如果文本中已有相关症状，才添加图像症状（减少误判）
-        # 例如：文本提到"小红点"，图像提取"皮疹"则保留；图像单独提取"发热"则排除
-        validated_symptoms = []
-        for sym in image_symptoms:
-            # 检查是否与文本症状相关
-            is_related = any(
-                sym in text_symptom or text_symptom in sym 
-                for text_symptom in text_symptoms
-            )
-            # 对于完全无文本输入的情况，直接保留图像症状
-            if is_related or not text_symptoms:
-                validated_symptoms.append(sym)
-        
-        # 合并并去重
-        all_symptoms = list(set(symptoms + validated_symptoms))
-        
-        # 最终过滤：移除明显不相关的症状（针对皮肤症状的特殊处理）
-        skin_related = {"皮疹", "红斑", "丘疹", "瘙痒", "疼痛", "红点", "斑疹", "水疱"}
-        filtered = [s for s in all_symptoms if s in skin_related]
-        
-        return filtered if filtered else all_symptoms
-
-    def extract_relations(self, medical_text: str) -> List[Dict]:
-        """从文本中抽取实体关系（支持新的实体和关系类型）"""
-        if not medical_text:
-            return []
-        
-        entity_types_str = "\n".join([f"- {k}: {v}" for k, v in ENTITY_TYPES.items()])
-        relation_types_str = "\n".join([f"- {k}: {v}" for k, v in RELATION_TYPES.items()])
-        
-        prompt = f"""作为医疗知识工程师，从以下文本中提取实体-关系对。
-严格遵循规则：
-
-1. 实体类型（仅使用这些，不自定义）：
-{entity_types_str}
-
-2. 关系类型（仅使用这些，不自定义）：
-{relation_types_str}
-
-3. 输出格式：
-返回Python字典列表，每个字典包含键：
-"source"（实体名）、"source_type"（实体类型）、
-"target"（实体名）、"target_type"（实体类型）、
-"relation"（关系类型）。
-
-医疗文本：{medical_text}
-
-直接返回关系列表（无额外文本）："""
-        
-        result = self.text_generation(prompt)
-        
-        try:
-            result = result.strip()
-            if not result.startswith("["):
-                result = re.sub(r'^.*?\[', '[', result)
-            if not result.endswith("]"):
-                result = re.sub(r'\].*$', ']', result)
-            
-            relations = json.loads(result.replace("'", '"'))
-            valid_relations = []
-            for rel in relations:
-                if all(k in rel for k in ["source", "source_type", "target", "target_type", "relation"]) and \
-                   rel["source_type"] in ENTITY_TYPES and \
-                   rel["target_type"] in ENTITY_TYPES and \
-                   rel["relation"] in RELATION_TYPES:
-                    valid_relations.append(rel)
-            return valid_relations
-        except Exception as e:
-            print(f"关系抽取失败：{e}")
-            return []
-
-    def enhance_with_graph_context(self, entity_list: List[str], entity_type: str) -> str:
-        """从知识图谱获取上下文增强"""
-        if not self.graph_kb or not entity_list:
-            return "无可用图谱知识"
-        
-        graph_context = []
-        for entity in entity_list:
-            related_relations = self.graph_kb.query_related_entities(entity)
-            if not related_relations:
-                continue
-            
-            for src, rel, tgt, tgt_type in related_relations:
-                relation_str = f"{src}（{self.graph_kb.graph.nodes[src]['type']}）→{rel}→ {tgt}（{tgt_type}）"
-                graph_context.append(relation_str)
-        
-        unique_context = list(set(graph_context))
-        return "\n".join(unique_context) if unique_context else "图谱中无相关知识"
-
-    def analyze_risk(self, symptoms: List[str], medical_info: Dict = None) -> Dict:
-        """风险分析（集成图谱上下文）"""
-        if not symptoms:
-            return {
-                "risk_level": 1,
-                "urgency": "请详细描述症状",
-                "recommendations": ["请提供详细症状以进行准确评估"]
-            }
-        
-        graph_context = ""
-        if medical_info and "graph_kb" in medical_info:
-            self.graph_kb = medical_info["graph_kb"]
-            graph_context = self.enhance_with_graph_context(symptoms, entity_type="Symptom")
-        
-        prompt = f"""作为专业医疗风险评估师，基于症状和图谱知识评估风险。
-
-【症状列表】：{', '.join(symptoms)}
-
-【图谱知识上下文】：
-{graph_context}
-
-返回Python字典，包含：
-- risk_level: 1-5（1=极低，2=低，3=中，4=高，5=紧急）
-- urgency: 就医建议（如"紧急就诊"、"常规门诊"）
-- recommendations: 3-5条具体建议（避免模糊表述）
-
-示例：
-{{
-    "risk_level": 4,
-    "urgency": "建议24小时内紧急就诊",
-    "recommendations": [
-        "前往呼吸科进行流感病毒检测",
-        "避免与家人密切接触以防传播",
-        "体温超过38.5℃时服用退烧药",
-        "每日饮水1.5-2L预防脱水"
-    ]
-}}
-
-直接返回字典（无额外文本）："""
-        
-        result = self.text_generation(prompt)
-        return self._parse_medical_dict(result)
-
-    def generate_treatment_plan(self, symptoms: List[str], medical_info: Dict = None) -> Dict:
-        """生成治疗方案（集成图谱上下文）"""
-        if not symptoms:
-            return {
-                "examinations": ["请先提供详细症状"],
-                "medications": ["药物需根据具体诊断确定"],
-                "lifestyle": ["保持健康生活方式"]
-            }
-        
-        graph_context = ""
-        if medical_info and "graph_kb" in medical_info:
-            self.graph_kb = medical_info["graph_kb"]
-            graph_context = self.enhance_with_graph_context(symptoms, entity_type="Symptom")
-        
-        prompt = f"""作为医疗顾问，基于症状和图谱知识生成治疗方案。
-
-【症状列表】：{', '.join(symptoms)}
-
-【图谱知识上下文】（疾病-治疗-检查关系）：
-{graph_context}
-
-返回Python字典，包含：
-- examinations: 3-4项推荐检查（匹配图谱知识）
-- medications: 3条安全建议（不含处方药，需注明"遵医嘱"）
-- lifestyle: 4-5条可操作的生活建议（针对症状定制）
-
-直接返回字典（无额外文本）："""
-        
-        result = self.text_generation(prompt)
-        return self._parse_medical_dict(result)
-
-    def _parse_medical_dict(self, result: str) -> Dict:
-        """解析医疗相关字典输出"""
-        try:
-            result = result.strip()
-            if result.startswith("```"):
-                result = result.split("```")[1].strip()
-            if result.startswith(("python", "json")):
-                result = result.split("\n", 1)[1].strip()
-            
-            try:
-                return json.loads(result)
-            except:
-                return eval(result)
-        except Exception as e:
-            print(f"字典解析失败：{e}")
-            return {
-                "risk_level": 2,
-                "urgency": "建议就医咨询",
-                "examinations": ["相关专科检查", "基础体检项目"],
-                "medications": ["遵医嘱用药", "避免自行用药"],
-                "lifestyle": ["充分休息", "均衡饮食", "监测症状"]
-            }
-
-    def test_connection(self) -> bool:
-        """测试模型连接"""
-        try:
-            response = self.text_generation("返回'OK'确认连接")
-            return "OK" in response.strip()
-        except:
-            return False
-
-    def extract_entities_from_text(self, text: str) -> List[str]:
-        """从医疗文本中提取关键实体（疾病、症状、治疗方法等）"""
-        if not text:
-            return []
-        
-        prompt = f"""从以下医疗诊断报告中提取关键实体，包括但不限于：
-        - 疾病名称
-        - 症状
-        - 治疗方法
-        - 检查项目
-        - 身体部位
-        
-        仅返回实体列表，每个实体一行，不要添加任何解释或说明：
-
-{text}
-
-实体列表："""
-        
-        result = self.text_generation(prompt)
-        # 解析结果，过滤空行和无效内容
-        entities = [line.strip() for line in result.split('\n') if line.strip() and not line.strip().startswith('-')]
-        return list(set(entities))  # 去重
-
-    def medical_image_analysis(self, image_path: str, custom_prompt: str = None) -> str:
-        """医疗图像分析"""
-        if not image_path or not os.path.exists(image_path):
-            return "图像路径不存在"
-        
-        base64_image = self.encode_image(image_path)
-        
-        prompt = custom_prompt if custom_prompt else """作为专业医疗影像分析师，请分析此图像并提供详细的医学解读，
-包括可见的异常特征、可能的诊断方向和建议的进一步检查。请保持客观，不做确定性诊断。"""
-        
-        messages = [
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": prompt},
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/jpeg;base64,{base64_image}",
-                            "detail": "high"
-                        }
-                    }
-                ]
-            }
-        ]
-        
-        return self.chat_completion(messages, stream=False)
+import os
+import ast
+import base64
+import json
+import mmap
+import re
+import asyncio
+import time
+import httpx
+from openai import OpenAI, AsyncOpenAI, APIConnectionError, APITimeoutError
+from typing import List, Dict, Optional, Tuple
+from cache_utils import TTLCache, MISS
+from graph_kb import GraphKnowledgeBase
+from graph_schema import ENTITY_TYPES, RELATION_TYPES
+
+# 模块级预编译的解析用正则，避免每次调用重新构建
+_LIST_RE = re.compile(r'\[(.*?)\]', re.S)
+_LEADING_JUNK_RE = re.compile(r'^.*?\[')
+_TRAILING_JUNK_RE = re.compile(r'\].*$')
+
+# 图谱上下文最多拼接的关系行数
+_MAX_CTX_LINES = 200
+
+# schema描述在导入时渲染一次，不在每次调用时重新join
+_ENTITY_TYPES_STR = "\n".join(f"- {k}: {v}" for k, v in ENTITY_TYPES.items())
+_RELATION_TYPES_STR = "\n".join(f"- {k}: {v}" for k, v in RELATION_TYPES.items())
+
+# 提示词模板（模块级常量，静态部分只构建一次，调用时仅填充动态槽位）
+_SYMPTOM_PROMPT_TMPL = """从以下医疗描述中提取关键症状，严格遵循：
+1. 仅提取文本中**明确提到**的症状，**绝对不添加任何未提及的症状**
+2. 使用标准医学术语（如用"发热"而非"身体热"，"咳嗽"而非"嗓子痒"）
+3. 仅返回Python字符串列表，无额外文本（例如：["发热", "干咳", "乏力"]）
+4. 最多提取8个最关键的症状（忽略无关描述）
+5. 排除疾病名称（如"流感"是疾病，"高热"是症状）
+6. 如果未提到任何症状，返回空列表[]
+
+患者描述：{text}
+
+直接返回症状列表（无需代码块）："""
+
+_RELATION_PROMPT_TMPL = """作为医疗知识工程师，从以下文本中提取实体-关系对。
+严格遵循规则：
+
+1. 实体类型（仅使用这些，不自定义）：
+{entity_types}
+
+2. 关系类型（仅使用这些，不自定义）：
+{relation_types}
+
+3. 输出格式：
+返回Python字典列表，每个字典包含键：
+"source"（实体名）、"source_type"（实体类型）、
+"target"（实体名）、"target_type"（实体类型）、
+"relation"（关系类型）。
+
+医疗文本：{medical_text}
+
+直接返回关系列表（无额外文本）：""".format(
+    entity_types=_ENTITY_TYPES_STR,
+    relation_types=_RELATION_TYPES_STR,
+    medical_text="{medical_text}"
+)
+
+_RISK_PROMPT_TMPL = """作为专业医疗风险评估师，基于症状和图谱知识评估风险。
+
+【症状列表】：{symptoms}
+
+【图谱知识上下文】：
+{graph_context}
+
+返回Python字典，包含：
+- risk_level: 1-5（1=极低，2=低，3=中，4=高，5=紧急）
+- urgency: 就医建议（如"紧急就诊"、"常规门诊"）
+- recommendations: 3-5条具体建议（避免模糊表述）
+
+示例：
+{{
+    "risk_level": 4,
+    "urgency": "建议24小时内紧急就诊",
+    "recommendations": [
+        "前往呼吸科进行流感病毒检测",
+        "避免与家人密切接触以防传播",
+        "体温超过38.5℃时服用退烧药",
+        "每日饮水1.5-2L预防脱水"
+    ]
+}}
+
+直接返回字典（无额外文本）："""
+
+_TREATMENT_PROMPT_TMPL = """作为医疗顾问，基于症状和图谱知识生成治疗方案。
+
+【症状列表】：{symptoms}
+
+【图谱知识上下文】（疾病-治疗-检查关系）：
+{graph_context}
+
+返回Python字典，包含：
+- examinations: 3-4项推荐检查（匹配图谱知识）
+- medications: 3条安全建议（不含处方药，需注明"遵医嘱"）
+- lifestyle: 4-5条可操作的生活建议（针对症状定制）
+
+直接返回字典（无额外文本）："""
+
+_ENTITY_BATCH_PROMPT_TMPL = """从以下多份医疗文本中分别提取关键实体（疾病名称、症状、治疗方法、检查项目、身体部位等）。
+返回一个JSON对象：键为文本编号（"1"、"2"……），值为该文本的实体字符串列表。
+仅返回JSON，不要任何解释。
+
+{reports}
+
+JSON结果："""
+
+_RELATION_BATCH_PROMPT_TMPL = """作为医疗知识工程师，从以下多份医疗文本中分别提取实体-关系对。
+严格遵循规则：
+
+1. 实体类型（仅使用这些，不自定义）：
+{entity_types}
+
+2. 关系类型（仅使用这些，不自定义）：
+{relation_types}
+
+3. 输出格式：
+返回一个JSON对象：键为文本编号（"1"、"2"……），值为该文本的关系列表，
+每个关系包含键"source"、"source_type"、"target"、"target_type"、"relation"。
+仅返回JSON，不要任何解释。
+
+{reports}
+
+JSON结果：""".format(
+    entity_types=_ENTITY_TYPES_STR,
+    relation_types=_RELATION_TYPES_STR,
+    reports="{reports}"
+)
+
+_ENTITY_EXTRACT_PROMPT_TMPL = """从以下医疗诊断报告中提取关键实体，包括但不限于：
+        - 疾病名称
+        - 症状
+        - 治疗方法
+        - 检查项目
+        - 身体部位
+
+        仅返回实体列表，每个实体一行，不要添加任何解释或说明：
+
+{text}
+
+实体列表："""
+
+
+class ErnieClient:
+    # 症状同义词表（类级常量，避免在解析循环里重建）
+    _SYMPTOM_SYNONYMS = {
+        "小红点": "皮疹",
+        "痒": "瘙痒",
+        "疼": "疼痛",
+        "红点": "皮疹"
+    }
+    # 同义词关键词的单遍匹配器：一次扫描代替逐关键词的in检查
+    _SYNONYM_KEYS_RE = re.compile("|".join(re.escape(k) for k in _SYMPTOM_SYNONYMS))
+    # 皮肤相关症状（最终过滤用），frozenset保证O(1)成员判断
+    _SKIN_RELATED = frozenset({"皮疹", "红斑", "丘疹", "瘙痒", "疼痛", "红点", "斑疹", "水疱"})
+
+    def __init__(self,
+                 host: str = "0.0.0.0",
+                 port: str = "8180",
+                 model_name: str = "local-vl-model",
+                 graph_kb: Optional[GraphKnowledgeBase] = None,
+                 request_timeout: float = 30.0,
+                 max_retries: int = 2):
+        """初始化本地化VL模型客户端，支持多模态输入
+
+        request_timeout/max_retries控制单次请求的超时和重试次数，
+        避免个别长尾请求卡住整条流水线。
+        """
+        self.host = host
+        self.port = port
+        self.model_name = model_name
+        self.base_url = f"http://{host}:{port}/v1"
+        self.graph_kb = graph_kb
+        self.request_timeout = request_timeout
+        self.max_retries = max_retries
+        
+        # 共享连接池：复用TCP连接，避免每次调用重新建连
+        # （本地明文HTTP服务不走h2c，这里不开HTTP/2）
+        _limits = httpx.Limits(max_connections=64, max_keepalive_connections=32)
+        _timeout = httpx.Timeout(60.0, connect=2.0)
+        self.client = OpenAI(
+            api_key="null",
+            base_url=self.base_url,
+            http_client=httpx.Client(limits=_limits, timeout=_timeout)
+        )
+        # 异步侧禁用keep-alive：调用方按请求asyncio.run()，事件循环
+        # 随调用关闭。若复用连接，第二次请求会拿到绑定在已关闭循环上
+        # 的socket，抛出"Event loop is closed"并被降级逻辑吞掉。
+        # 本地回环上重新建连的开销可以忽略，正确性优先
+        _async_limits = httpx.Limits(max_connections=64, max_keepalive_connections=0)
+        self.async_client = AsyncOpenAI(
+            api_key="null",
+            base_url=self.base_url,
+            http_client=httpx.AsyncClient(limits=_async_limits, timeout=_timeout)
+        )
+        # 相同提示词的结果缓存：重复的症状组合直接命中，省掉一次模型往返
+        self._text_cache = TTLCache(maxsize=1024, ttl=300.0)
+        # Base64编码缓存：同一会话内反复使用同一张图时免去重复编码
+        # 键包含大小和mtime，文件被替换后自动失效
+        self._img_cache: Dict[Tuple[str, int, int], str] = {}
+
+    def encode_image(self, image_path: str) -> str:
+        """图片转Base64编码（按路径+大小+mtime缓存）"""
+        try:
+            st = os.stat(image_path)
+            cache_key = (image_path, st.st_size, st.st_mtime_ns)
+            cached = self._img_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+            with open(image_path, "rb") as image_file:
+                if st.st_size:
+                    # mmap避免把整个文件先读进Python bytes，降低大图的峰值内存
+                    with mmap.mmap(image_file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        encoded = base64.b64encode(mm).decode('utf-8')
+                else:
+                    encoded = base64.b64encode(image_file.read()).decode('utf-8')
+
+            self._img_cache[cache_key] = encoded
+            return encoded
+        except Exception as e:
+            raise Exception(f"图像编码失败: {str(e)}")
+
+    def chat_completion(self, messages: List[Dict], stream: bool = True, response_format: Optional[Dict] = None) -> str:
+        """基础对话接口
+
+        response_format传{"type": "json_object"}可启用服务端JSON模式，
+        让结构化输出不再依赖正则清洗。
+        超时/连接失败按指数退避重试，重试耗尽后返回错误信息。
+        """
+        extra = {"response_format": response_format} if response_format else {}
+        for attempt in range(self.max_retries + 1):
+            try:
+                completion = self.client.chat.completions.create(
+                    model=self.model_name,
+                    messages=messages,
+                    stream=stream,
+                    temperature=0.3,
+                    timeout=self.request_timeout,
+                    **extra
+                )
+
+                if stream:
+                    # 用列表缓冲+join拼接，避免逐token的str +=产生O(n²)拷贝
+                    parts = []
+                    for chunk in completion:
+                        if chunk.choices:
+                            delta = chunk.choices[0].delta.content
+                            if delta:
+                                parts.append(delta)
+                    return ''.join(parts)
+                else:
+                    return completion.choices[0].message.content
+            except (APITimeoutError, APIConnectionError, httpx.TimeoutException) as e:
+                if attempt >= self.max_retries:
+                    return f"模型请求失败: {str(e)}"
+                time.sleep(0.5 * 2 ** attempt)
+            except Exception as e:
+                return f"模型请求失败: {str(e)}"
+
+    async def achat_completion(self, messages: List[Dict], stream: bool = False, response_format: Optional[Dict] = None) -> str:
+        """基础对话接口（异步版，用于并发发起多个模型调用）
+
+        与同步版相同：超时/连接失败按指数退避重试。
+        """
+        extra = {"response_format": response_format} if response_format else {}
+        for attempt in range(self.max_retries + 1):
+            try:
+                completion = await self.async_client.chat.completions.create(
+                    model=self.model_name,
+                    messages=messages,
+                    stream=stream,
+                    temperature=0.3,
+                    timeout=self.request_timeout,
+                    **extra
+                )
+
+                if stream:
+                    parts = []
+                    async for chunk in completion:
+                        if chunk.choices:
+                            delta = chunk.choices[0].delta.content
+                            if delta:
+                                parts.append(delta)
+                    return ''.join(parts)
+                else:
+                    return completion.choices[0].message.content
+            except (APITimeoutError, APIConnectionError, httpx.TimeoutException) as e:
+                if attempt >= self.max_retries:
+                    return f"模型请求失败: {str(e)}"
+                await asyncio.sleep(0.5 * 2 ** attempt)
+            except Exception as e:
+                return f"模型请求失败: {str(e)}"
+
+    def text_generation(self, prompt: str, system_prompt: str = None, json_mode: bool = False) -> str:
+        """纯文本生成（带结果缓存；json_mode=True时启用服务端JSON输出）"""
+        cache_key = (prompt, system_prompt, json_mode)
+        cached = self._text_cache.get(cache_key)
+        if cached is not MISS:
+            return cached
+
+        response_format = {"type": "json_object"} if json_mode else None
+        result = self.chat_completion(
+            self._build_text_messages(prompt, system_prompt),
+            stream=False,
+            response_format=response_format
+        )
+        if not result.startswith("模型请求失败"):
+            self._text_cache.set(cache_key, result)
+        return result
+
+    async def atext_generation(self, prompt: str, system_prompt: str = None, json_mode: bool = False) -> str:
+        """纯文本生成（异步版，与同步版共享缓存）"""
+        cache_key = (prompt, system_prompt, json_mode)
+        cached = self._text_cache.get(cache_key)
+        if cached is not MISS:
+            return cached
+
+        response_format = {"type": "json_object"} if json_mode else None
+        result = await self.achat_completion(
+            self._build_text_messages(prompt, system_prompt),
+            stream=False,
+            response_format=response_format
+        )
+        if not result.startswith("模型请求失败"):
+            self._text_cache.set(cache_key, result)
+        return result
+
+    def _build_text_messages(self, prompt: str, system_prompt: str = None) -> List[Dict]:
+        """构造纯文本请求的消息列表"""
+        messages = []
+
+        if system_prompt:
+            messages.append({
+                "role": "system",
+                "content": system_prompt
+            })
+
+        messages.append({
+            "role": "user",
+            "content": prompt
+        })
+
+        return messages
+
+    def analyze_image_and_text(self, text: str = None, image_path: str = None) -> str:
+        """多模态分析（文本+图像）"""
+        if not text and not image_path:
+            return "请提供文本或图像进行分析"
+        
+        content = []
+        
+        if image_path:
+            try:
+                base64_image = self.encode_image(image_path)
+                content.append({
+                    "type": "image_url",
+                    "image_url": {
+                        "url": f"data:image/jpeg;base64,{base64_image}",
+                        "detail": "high"
+                    }
+                })
+            except Exception as e:
+                return f"图像处理失败: {str(e)}"
+        
+        if text:
+            content.append({
+                "type": "text",
+                "text": text
+            })
+        
+        messages = [{
+            "role": "user",
+            "content": content
+        }]
+        
+        return self.chat_completion(messages, stream=False)
+
+    def analyze_symptoms(self, text: str) -> List[str]:
+        """从自然语言文本中提取症状（优化版：严格限制只提取明确提到的症状）"""
+        result = self.text_generation(_SYMPTOM_PROMPT_TMPL.format(text=text))
+        
+        try:
+            result = result.strip().replace("'", '"').replace("\n", "")
+            match = _LIST_RE.search(result)
+            if match:
+                symptoms = json.loads(f"[{match.group(1)}]")
+                # 额外过滤：只保留文本中明确出现的症状
+                filtered = []
+                synonyms = self._SYMPTOM_SYNONYMS
+                # 同义词关键词只对全文扫描一次，而不是在循环里逐个in检查
+                synonym_hit = self._SYNONYM_KEYS_RE.search(text) is not None
+                for s in symptoms:
+                    # 处理同义词匹配（如"小红点"对应"皮疹"）
+                    normalized = synonyms.get(s, s)
+                    # 检查原始文本是否包含该症状或其同义词
+                    if synonym_hit or s in text or normalized in text:
+                        filtered.append(normalized)
+                return list(set(filtered))  # 去重
+        except Exception as e:
+            print(f"症状解析错误: {e}")
+            return []
+        
+        return []
+
+    def extract_symptoms_from_multimodal(self, text: Optional[str] = None, image_path: Optional[str] = None) -> List[str]:
+        """从自然语言和图像中联合提取症状（优化版：增加交叉验证）"""
+        symptoms = []
+        
+        # 1. 从文本提取症状（作为基准）
+        text_symptoms = []
+        if text and text.strip():
+            text_symptoms = self.analyze_symptoms(text)
+            symptoms.extend(text_symptoms)
+            print(f"从文本提取症状：{text_symptoms}")
+        
+        # 2. 从图像提取症状（增加严格约束）
+        image_symptoms = []
+        if image_path:
+            try:
+                # 图像分析提示词优化：只描述可见特征，不推测未显示症状
+                image_analysis = self.medical_image_analysis(
+                    image_path,
+                    custom_prompt="""作为专业医疗影像分析师，请仅描述图像中**明确可见**的皮肤症状特征：
+1. 病灶形态（如：红色丘疹、斑疹、水疱）
+2. 颜色特征（如：红色、淡粉色）
+3. 分布情况（如：散在分布、局部聚集）
+4. 绝对不要添加任何图像中未显示的症状或进行疾病推测
+5. 用客观描述，避免主观判断"""
+                )
+                print(f"图像分析结果：{image_analysis[:100]}...")
+                
+                # 从图像分析中提取症状（严格模式）
+                prompt = f"""从以下图像分析结果中提取皮肤症状关键词，严格遵循：
+1. 仅提取**明确描述**的症状，不添加任何推测性症状
+2. 每个症状必须是图像中可见的（如"皮疹"、"红斑"）
+3. 仅返回Python列表，无额外文本
+4. 如果没有明确症状，返回空列表[]
+
+图像分析结果：{image_analysis}
+
+直接返回症状列表："""
+                image_symptoms = self.text_generation(prompt)
+                
+                # 解析并过滤图像症状
+                image_symptoms = image_symptoms.strip().replace("'", '"')
+                if image_symptoms.startswith("```"):
+                    image_symptoms = image_symptoms.split("```")[1].strip()
+                image_symptoms = json.loads(image_symptoms)
+                image_symptoms = [s for s in image_symptoms if isinstance(s, str) and s]
+                
+                print(f"从图像提取症状：{image_symptoms}")
+            except Exception as e:
+                print(f"图像症状提取失败：{e}")
+        
+        # 3. 交叉验证：如果文本中已有相关症状，才添加图像症状（减少误判）
+        # 例如：文本提到"小红点"，图像提取"皮疹"则保留；图像单独提取"发热"则排除
+        validated_symptoms = []
+        for sym in image_symptoms:
+            # 检查是否与文本症状相关
+            is_related = any(
+                sym in text_symptom or text_symptom in sym 
+                for text_symptom in text_symptoms
+            )
+            # 对于完全无文本输入的情况，直接保留图像症状
+            if is_related or not text_symptoms:
+                validated_symptoms.append(sym)
+        
+        # 合并并去重
+        all_symptoms = list(set(symptoms + validated_symptoms))
+        
+        # 最终过滤：移除明显不相关的症状（针对皮肤症状的特殊处理）
+        filtered = [s for s in all_symptoms if s in self._SKIN_RELATED]
+        
+        return filtered if filtered else all_symptoms
+
+    def extract_relations(self, medical_text: str) -> List[Dict]:
+        """从文本中抽取实体关系（支持新的实体和关系类型）"""
+        if not medical_text:
+            return []
+
+        result = self.text_generation(_RELATION_PROMPT_TMPL.format(medical_text=medical_text))
+        return self._parse_relations_result(result)
+
+    async def aextract_relations(self, medical_text: str) -> List[Dict]:
+        """从文本中抽取实体关系（异步版，供并发批量构建图谱使用）"""
+        if not medical_text:
+            return []
+
+        result = await self.atext_generation(_RELATION_PROMPT_TMPL.format(medical_text=medical_text))
+        return self._parse_relations_result(result)
+
+    def _parse_relations_result(self, result: str) -> List[Dict]:
+        """解析关系抽取的模型输出，失败时返回空列表"""
+        try:
+            result = result.strip()
+            if not result.startswith("["):
+                result = _LEADING_JUNK_RE.sub('[', result)
+            if not result.endswith("]"):
+                result = _TRAILING_JUNK_RE.sub(']', result)
+
+            relations = json.loads(result.replace("'", '"'))
+            return self._validate_relations(relations)
+        except Exception as e:
+            print(f"关系抽取失败：{e}")
+            return []
+
+    def extract_relations_batch(self, medical_texts: List[str]) -> List[List[Dict]]:
+        """批量关系抽取：多份文本合并为一次模型调用
+
+        把N份短文本拼成一个带编号的提示词，共享系统提示和TTFT开销，
+        返回与输入顺序对应的关系列表（解析失败的文本返回空列表）。
+        """
+        texts = [t for t in medical_texts if t]
+        if not texts:
+            return [[] for _ in medical_texts]
+
+        reports = "\n---\n".join(f"文本{i + 1}：{t}" for i, t in enumerate(texts))
+        result = self.text_generation(_RELATION_BATCH_PROMPT_TMPL.format(reports=reports), json_mode=True)
+
+        parsed = self._parse_batch_json(result)
+        results_iter = iter(
+            self._validate_relations(parsed.get(str(i + 1), []))
+            for i in range(len(texts))
+        )
+        # 空文本占位，保证输出与输入一一对应
+        return [next(results_iter) if t else [] for t in medical_texts]
+
+    def extract_entities_batch(self, texts: List[str]) -> List[List[str]]:
+        """批量实体抽取：多份报告合并为一次模型调用"""
+        valid_texts = [t for t in texts if t]
+        if not valid_texts:
+            return [[] for _ in texts]
+
+        reports = "\n---\n".join(f"文本{i + 1}：{t}" for i, t in enumerate(valid_texts))
+        result = self.text_generation(_ENTITY_BATCH_PROMPT_TMPL.format(reports=reports), json_mode=True)
+
+        parsed = self._parse_batch_json(result)
+        results_iter = iter(
+            [e for e in parsed.get(str(i + 1), []) if isinstance(e, str) and e.strip()]
+            for i in range(len(valid_texts))
+        )
+        return [next(results_iter) if t else [] for t in texts]
+
+    def _validate_relations(self, relations: List[Dict]) -> List[Dict]:
+        """过滤掉字段缺失或类型不在schema内的关系"""
+        valid_relations = []
+        for rel in relations:
+            if all(k in rel for k in ["source", "source_type", "target", "target_type", "relation"]) and \
+               rel["source_type"] in ENTITY_TYPES and \
+               rel["target_type"] in ENTITY_TYPES and \
+               rel["relation"] in RELATION_TYPES:
+                valid_relations.append(rel)
+        return valid_relations
+
+    def _parse_batch_json(self, result: str) -> Dict:
+        """解析批量调用返回的编号JSON对象，失败时返回空字典"""
+        try:
+            result = result.strip()
+            if result.startswith("```"):
+                result = result.split("```")[1].strip()
+            if result.startswith(("python", "json")):
+                result = result.split("\n", 1)[1].strip()
+            parsed = json.loads(result)
+            return parsed if isinstance(parsed, dict) else {}
+        except Exception as e:
+            print(f"批量结果解析失败：{e}")
+            return {}
+
+    def enhance_with_graph_context(self, entity_list: List[str], entity_type: str) -> str:
+        """从知识图谱获取上下文增强"""
+        if not self.graph_kb or not entity_list:
+            return "无可用图谱知识"
+        
+        # 直接累积到dict键里去重（保序），源类型由查询结果自带，无需回查图
+        # 超过上限就提前收手，避免超大上下文撑爆提示词
+        graph_context = {}
+        for entity in entity_list:
+            if len(graph_context) >= _MAX_CTX_LINES:
+                break
+            related_relations = self.graph_kb.query_related_entities(entity)
+
+            for src, src_type, rel, tgt, tgt_type in related_relations:
+                graph_context[f"{src}（{src_type}）→{rel}→ {tgt}（{tgt_type}）"] = None
+                if len(graph_context) >= _MAX_CTX_LINES:
+                    break
+
+        return "\n".join(graph_context) if graph_context else "图谱中无相关知识"
+
+    def analyze_risk(self, symptoms: List[str], medical_info: Dict = None) -> Dict:
+        """风险分析（集成图谱上下文）"""
+        if not symptoms:
+            return self._empty_risk_result()
+
+        result = self.text_generation(self._build_risk_prompt(symptoms, medical_info), json_mode=True)
+        return self._parse_medical_dict(result)
+
+    async def aanalyze_risk(self, symptoms: List[str], medical_info: Dict = None) -> Dict:
+        """风险分析（异步版，供并发诊断流程调用）"""
+        if not symptoms:
+            return self._empty_risk_result()
+
+        result = await self.atext_generation(self._build_risk_prompt(symptoms, medical_info), json_mode=True)
+        return self._parse_medical_dict(result)
+
+    def _empty_risk_result(self) -> Dict:
+        return {
+            "risk_level": 1,
+            "urgency": "请详细描述症状",
+            "recommendations": ["请提供详细症状以进行准确评估"]
+        }
+
+    def _build_risk_prompt(self, symptoms: List[str], medical_info: Dict = None) -> str:
+        """构造风险分析提示词（集成图谱上下文）"""
+        graph_context = ""
+        if medical_info and "graph_kb" in medical_info:
+            self.graph_kb = medical_info["graph_kb"]
+            graph_context = self.enhance_with_graph_context(symptoms, entity_type="Symptom")
+
+        return _RISK_PROMPT_TMPL.format(symptoms=', '.join(symptoms), graph_context=graph_context)
+
+    def generate_treatment_plan(self, symptoms: List[str], medical_info: Dict = None) -> Dict:
+        """生成治疗方案（集成图谱上下文）"""
+        if not symptoms:
+            return self._empty_treatment_result()
+
+        result = self.text_generation(self._build_treatment_prompt(symptoms, medical_info), json_mode=True)
+        return self._parse_medical_dict(result)
+
+    async def agenerate_treatment_plan(self, symptoms: List[str], medical_info: Dict = None) -> Dict:
+        """生成治疗方案（异步版，供并发诊断流程调用）"""
+        if not symptoms:
+            return self._empty_treatment_result()
+
+        result = await self.atext_generation(self._build_treatment_prompt(symptoms, medical_info), json_mode=True)
+        return self._parse_medical_dict(result)
+
+    def _empty_treatment_result(self) -> Dict:
+        return {
+            "examinations": ["请先提供详细症状"],
+            "medications": ["药物需根据具体诊断确定"],
+            "lifestyle": ["保持健康生活方式"]
+        }
+
+    def _build_treatment_prompt(self, symptoms: List[str], medical_info: Dict = None) -> str:
+        """构造治疗方案提示词（集成图谱上下文）"""
+        graph_context = ""
+        if medical_info and "graph_kb" in medical_info:
+            self.graph_kb = medical_info["graph_kb"]
+            graph_context = self.enhance_with_graph_context(symptoms, entity_type="Symptom")
+
+        return _TREATMENT_PROMPT_TMPL.format(symptoms=', '.join(symptoms), graph_context=graph_context)
+
+    def _parse_medical_dict(self, result: str) -> Dict:
+        """解析医疗相关字典输出"""
+        try:
+            result = result.strip()
+            # JSON模式下服务端直接返回裸JSON，走快速路径
+            try:
+                return json.loads(result)
+            except (ValueError, TypeError):
+                pass
+            if result.startswith("```"):
+                result = result.split("```")[1].strip()
+            if result.startswith(("python", "json")):
+                result = result.split("\n", 1)[1].strip()
+            
+            try:
+                return json.loads(result)
+            except:
+                # literal_eval只接受Python字面量，避免eval的任意代码执行
+                return ast.literal_eval(result)
+        except Exception as e:
+            print(f"字典解析失败：{e}")
+            return {
+                "risk_level": 2,
+                "urgency": "建议就医咨询",
+                "examinations": ["相关专科检查", "基础体检项目"],
+                "medications": ["遵医嘱用药", "避免自行用药"],
+                "lifestyle": ["充分休息", "均衡饮食", "监测症状"]
+            }
+
+    def test_connection(self) -> bool:
+        """测试模型连接"""
+        try:
+            response = self.text_generation("返回'OK'确认连接")
+            return "OK" in response.strip()
+        except:
+            return False
+
+    def extract_entities_from_text(self, text: str) -> List[str]:
+        """从医疗文本中提取关键实体（疾病、症状、治疗方法等）"""
+        if not text:
+            return []
+
+        result = self.text_generation(_ENTITY_EXTRACT_PROMPT_TMPL.format(text=text))
+        # 解析结果，过滤空行和无效内容
+        entities = [line.strip() for line in result.split('\n') if line.strip() and not line.strip().startswith('-')]
+        return list(dict.fromkeys(entities))  # 去重且保留出现顺序
+
+    def medical_image_analysis(self, image_path: str, custom_prompt: str = None) -> str:
+        """医疗图像分析"""
+        if not image_path or not os.path.exists(image_path):
+            return "图像路径不存在"
+        
+        base64_image = self.encode_image(image_path)
+        
+        prompt = custom_prompt if custom_prompt else """作为专业医疗影像分析师，请分析此图像并提供详细的医学解读，
+包括可见的异常特征、可能的诊断方向和建议的进一步检查。请保持客观，不做确定性诊断。"""
+        
+        messages = [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": prompt},
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": f"data:image/jpeg;base64,{base64_image}",
+                            "detail": "high"
+                        }
+                    }
+                ]
+            }
+        ]
+        
+        return self.chat_completion(messages, stream=False)
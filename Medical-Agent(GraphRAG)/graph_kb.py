@@ -1,228 +1,678 @@
-import networkx as nx
-import pickle
-import os
-from typing import List, Tuple, Dict, Optional, Set
-from pyvis.network import Network
-from graph_schema import ENTITY_TYPES, RELATION_TYPES, ENTITY_COLORS  # 引入更新后的schema
-
-class GraphKnowledgeBase:
-    """基于NetworkX的医疗知识图谱实现，适配更新后的实体和关系类型"""
-    
-    def __init__(self):
-        """初始化知识图谱（有向图）"""
-        self.graph = nx.DiGraph()
-        # 从schema导入类型描述
-        self.entity_type_descriptions = {k: v.split("（")[0] for k, v in ENTITY_TYPES.items()}
-        self.relation_type_descriptions = {k: v.split("（")[0] for k, v in RELATION_TYPES.items()}
-
-    def add_relation(self, source: str, source_type: str, target: str, target_type: str, relation_type: str) -> bool:
-        """添加实体关系（验证类型是否在schema定义范围内）"""
-        # 验证实体类型和关系类型是否合法
-        if source_type not in ENTITY_TYPES:
-            print(f"警告：源实体类型 {source_type} 不在定义的ENTITY_TYPES中")
-            return False
-        if target_type not in ENTITY_TYPES:
-            print(f"警告：目标实体类型 {target_type} 不在定义的ENTITY_TYPES中")
-            return False
-        if relation_type not in RELATION_TYPES:
-            print(f"警告：关系类型 {relation_type} 不在定义的RELATION_TYPES中")
-            return False
-
-        try:
-            # 添加源实体（如果不存在）
-            if source not in self.graph.nodes:
-                self.graph.add_node(
-                    source, 
-                    type=source_type,
-                    label=self.entity_type_descriptions[source_type]
-                )
-            
-            # 添加目标实体（如果不存在）
-            if target not in self.graph.nodes:
-                self.graph.add_node(
-                    target, 
-                    type=target_type,
-                    label=self.entity_type_descriptions[target_type]
-                )
-            
-            # 添加关系
-            self.graph.add_edge(
-                source, 
-                target, 
-                type=relation_type,
-                label=self.relation_type_descriptions[relation_type]
-            )
-            return True
-        except Exception as e:
-            print(f"添加关系失败: {str(e)}")
-            return False
-
-    def query_related_entities(self, entity: str, relation: Optional[str] = None, max_hops: int = 1) -> List[Tuple[str, str, str, str]]:
-        """查询实体的相关实体（支持新增的RiskFactor等类型）"""
-        if entity not in self.graph.nodes:
-            return []
-        
-        result = []
-        visited = set()
-        queue = [(entity, 0)]  # (当前实体, 当前跳数)
-        
-        while queue:
-            current_entity, hops = queue.pop(0)
-            
-            if current_entity in visited or hops > max_hops:
-                continue
-                
-            visited.add(current_entity)
-            
-            # 遍历当前实体的所有出边
-            for neighbor in self.graph.successors(current_entity):
-                edge_data = self.graph.get_edge_data(current_entity, neighbor)
-                rel_type = edge_data.get('type', '')
-                
-                # 如果指定了关系类型，则只保留匹配的关系（支持DIAGNOSES、PREVENTS等）
-                if relation and rel_type != relation:
-                    continue
-                
-                # 获取邻居实体类型
-                neighbor_type = self.graph.nodes[neighbor].get('type', '')
-                
-                # 添加到结果
-                result.append((current_entity, rel_type, neighbor, neighbor_type))
-                
-                # 如果未达到最大跳数，继续遍历
-                if hops < max_hops:
-                    queue.append((neighbor, hops + 1))
-        
-        return result
-
-    def visualize(self, filename: str = "knowledge_graph.html", 
-                 highlight_entities: List[str] = None, 
-                 max_nodes: int = 100) -> None:
-        """可视化知识图谱（使用ENTITY_COLORS定义的颜色）"""
-        # 创建可视化网络
-        net = Network(
-            height="800px", 
-            width="100%", 
-            bgcolor="#f8f9fa", 
-            font_color="black",
-            directed=True
-        )
-        
-        # 从schema导入颜色映射（替换原硬编码颜色）
-        color_map = ENTITY_COLORS
-        
-        # 限制节点数量，避免可视化过于复杂
-        nodes = list(self.graph.nodes)[:max_nodes]
-        
-        # 添加节点
-        for node in nodes:
-            node_type = self.graph.nodes[node].get('type', 'Unknown')
-            # 使用schema中定义的颜色，未知类型用灰色
-            color = color_map.get(node_type, "#CCCCCC")
-            
-            # 如果是需要高亮的实体，使用更亮的颜色
-            if highlight_entities and node in highlight_entities:
-                color = self._lighten_color(color, 30)
-            
-            net.add_node(
-                node, 
-                label=node, 
-                title=f"{node}（{ENTITY_TYPES.get(node_type, node_type)}）",  # 显示完整类型描述
-                color=color,
-                size=25 if (highlight_entities and node in highlight_entities) else 20
-            )
-        
-        # 添加边（支持新增的关系类型）
-        for u, v, data in self.graph.edges(data=True):
-            if u in nodes and v in nodes:
-                rel_type = data.get('type', '')
-                net.add_edge(
-                    u, 
-                    v, 
-                    label=self.relation_type_descriptions.get(rel_type, rel_type),
-                    color="#AAAAAA",
-                    width=2
-                )
-        
-        # 配置物理引擎
-        net.set_options("""
-        var options = {
-            "physics": {
-                "forceAtlas2Based": {
-                    "springLength": 100
-                },
-                "minVelocity": 0.75,
-                "solver": "forceAtlas2Based",
-                "timestep": 0.35
-            }
-        }
-        """)
-        
-        # 保存可视化结果
-        net.write_html(filename)
-        print(f"知识图谱可视化已保存到 {filename}")
-
-    # 其他方法（find_paths、get_entity_type、save_to_file等）保持不变
-    def find_paths(self, source: str, target: str, max_length: int = 3) -> List[List[Tuple[str, str, str]]]:
-        if source not in self.graph.nodes or target not in self.graph.nodes:
-            return []
-        
-        try:
-            paths = []
-            for path in nx.all_simple_paths(self.graph, source=source, target=target, cutoff=max_length):
-                relation_path = []
-                for i in range(len(path) - 1):
-                    u = path[i]
-                    v = path[i + 1]
-                    rel_type = self.graph.get_edge_data(u, v).get('type', '')
-                    relation_path.append((u, rel_type, v))
-                if relation_path:
-                    paths.append(relation_path)
-            return paths
-        except Exception as e:
-            print(f"查找路径失败: {str(e)}")
-            return []
-
-    def get_entity_type(self, entity: str) -> Optional[str]:
-        if entity in self.graph.nodes:
-            return self.graph.nodes[entity].get('type')
-        return None
-
-    def get_all_entities(self, entity_type: Optional[str] = None) -> List[str]:
-        if entity_type:
-            return [node for node, data in self.graph.nodes(data=True) if data.get('type') == entity_type]
-        return list(self.graph.nodes)
-
-    def save_to_file(self, filename: str) -> bool:
-        try:
-            with open(filename, 'wb') as f:
-                pickle.dump(self.graph, f)
-            print(f"知识图谱已保存到 {filename}")
-            return True
-        except Exception as e:
-            print(f"保存知识图谱失败: {str(e)}")
-            return False
-
-    def load_from_file(self, filename: str) -> bool:
-        try:
-            if not os.path.exists(filename):
-                print(f"知识图谱文件 {filename} 不存在")
-                return False
-                
-            with open(filename, 'rb') as f:
-                self.graph = pickle.load(f)
-            print(f"已从 {filename} 加载知识图谱，包含 {len(self.graph.nodes)} 个实体和 {len(self.graph.edges)} 个关系")
-            return True
-        except Exception as e:
-            print(f"加载知识图谱失败: {str(e)}")
-            return False
-
-    def _lighten_color(self, color: str, percent: int) -> str:
-        from matplotlib.colors import rgb_to_hsv, hsv_to_rgb
-        import numpy as np
-        
-        rgb = np.array([int(color[1:3], 16), int(color[3:5], 16), int(color[5:7], 16)]) / 255.0
-        hsv = rgb_to_hsv(rgb)
-        hsv[2] = min(1.0, hsv[2] + percent / 100.0)
-        rgb = hsv_to_rgb(hsv)
-        return f"#{int(rgb[0]*255):02x}{int(rgb[1]*255):02x}{int(rgb[2]*255):02x}"
+import networkx as nx
+import numpy as np
+import pickle
+import os
+import sys
+from collections import deque
+from typing import Collection, List, NamedTuple, Tuple, Dict, Optional, Set
+from pyvis.network import Network
+from cache_utils import TTLCache, MISS
+from graph_schema import (  # 引入更新后的schema
+    ENTITY_TYPES, RELATION_TYPES, ENTITY_COLORS,
+    ENTITY_TYPE_DESCRIPTIONS, RELATION_TYPE_DESCRIPTIONS,
+)
+
+
+# 颜色串到(r, g, b)的解析缓存：ENTITY_COLORS只有7种取值，解析一次即可
+_HEX_CACHE: Dict[str, Tuple[int, int, int]] = {}
+
+# 校验只需要键的成员判断，预先固化成frozenset，不触碰schema字典的值
+_VALID_ENTITY_TYPES = frozenset(ENTITY_TYPES)
+_VALID_RELATION_TYPES = frozenset(RELATION_TYPES)
+
+
+class Relation(NamedTuple):
+    """图谱查询返回的关系行（内存布局同普通元组，解包方式不变）"""
+    src: str
+    src_type: str
+    rel: str
+    tgt: str
+    tgt_type: str
+
+
+class GraphKnowledgeBase:
+    """基于NetworkX的医疗知识图谱实现，适配更新后的实体和关系类型"""
+
+    def __init__(self):
+        """初始化知识图谱（有向图）"""
+        self.graph = nx.DiGraph()
+        # 从schema导入类型描述（模块级构建一份，所有实例共享同一字典）
+        self.entity_type_descriptions = ENTITY_TYPE_DESCRIPTIONS
+        self.relation_type_descriptions = RELATION_TYPE_DESCRIPTIONS
+        # 查询结果缓存：同一实体在多个代理间被反复查询，命中可免去重复遍历
+        # 图每次变更时_version自增并计入缓存键，旧结果自然失效
+        self._query_cache = TTLCache(maxsize=4096, ttl=600.0)
+        self._version = 0
+        # CSR形式的邻接缓存（indptr/邻居数组/边类型数组），首次查询时惰性构建
+        # 嵌套字典遍历变成连续数组扫描；图变更后置None失效
+        self._csr = None
+        # 热点节点的预物化邻居行（随CSR一起重建）
+        self._hot_neighbors = {}
+        # 按关系类型分组的邻接索引（随CSR一起重建），
+        # 带关系过滤的查询只触碰匹配类型的边
+        self._succ_by_rel = {}
+        # 前驱表（随CSR一起重建）：反向遍历直接取元组，
+        # 不必每次重建NetworkX的predecessors迭代器
+        self._pred = {}
+        # 可视化节点载荷缓存：node -> (title, 基础颜色)，图变更后失效
+        self._viz_payload = None
+
+    def add_relation(self, source: str, source_type: str, target: str, target_type: str, relation_type: str) -> bool:
+        """添加实体关系（验证类型是否在schema定义范围内）"""
+        # 验证实体类型和关系类型是否合法（合法输入单分支通过）
+        if (source_type not in _VALID_ENTITY_TYPES
+                or target_type not in _VALID_ENTITY_TYPES
+                or relation_type not in _VALID_RELATION_TYPES):
+            print(f"警告：类型不在schema定义范围内，已拒绝: "
+                  f"{source_type}/{target_type}/{relation_type}")
+            return False
+
+        # LLM输出解析出的类型串每次都是新对象，驻留后与schema共享同一份
+        source_type = sys.intern(source_type)
+        target_type = sys.intern(target_type)
+        relation_type = sys.intern(relation_type)
+
+        try:
+            # 添加源实体（如果不存在）
+            if source not in self.graph.nodes:
+                self.graph.add_node(
+                    source, 
+                    type=source_type,
+                    label=self.entity_type_descriptions[source_type]
+                )
+            
+            # 添加目标实体（如果不存在）
+            if target not in self.graph.nodes:
+                self.graph.add_node(
+                    target, 
+                    type=target_type,
+                    label=self.entity_type_descriptions[target_type]
+                )
+            
+            # 添加关系
+            self.graph.add_edge(
+                source,
+                target,
+                type=relation_type,
+                label=self.relation_type_descriptions[relation_type]
+            )
+            self._version += 1
+            self._csr = None
+            self._viz_payload = None
+            return True
+        except Exception as e:
+            print(f"添加关系失败: {str(e)}")
+            return False
+
+    def add_relations_bulk(self, relations: List[Dict]) -> int:
+        """批量添加实体关系（一次校验、一次add_nodes_from/add_edges_from）
+
+        行格式与extract_relations输出一致：source/source_type/target/
+        target_type/relation。相比逐条add_relation，省去每条边的
+        重复校验和add_node调用。返回实际添加的关系数。
+        """
+        nodes_payload = {}
+        edges_payload = []
+
+        for rel in relations:
+            try:
+                source, source_type = rel["source"], rel["source_type"]
+                target, target_type = rel["target"], rel["target_type"]
+                relation_type = rel["relation"]
+            except (KeyError, TypeError):
+                print(f"警告：关系行字段缺失，已跳过: {rel}")
+                continue
+
+            if (source_type not in _VALID_ENTITY_TYPES
+                    or target_type not in _VALID_ENTITY_TYPES
+                    or relation_type not in _VALID_RELATION_TYPES):
+                print(f"警告：类型不在schema定义范围内，已跳过: {rel}")
+                continue
+
+            source_type = sys.intern(source_type)
+            target_type = sys.intern(target_type)
+            relation_type = sys.intern(relation_type)
+
+            for name, etype in ((source, source_type), (target, target_type)):
+                if name not in self.graph.nodes and name not in nodes_payload:
+                    nodes_payload[name] = {
+                        'type': etype,
+                        'label': self.entity_type_descriptions[etype]
+                    }
+
+            edges_payload.append((source, target, {
+                'type': relation_type,
+                'label': self.relation_type_descriptions[relation_type]
+            }))
+
+        if not edges_payload:
+            return 0
+
+        self.graph.add_nodes_from(nodes_payload.items())
+        self.graph.add_edges_from(edges_payload)
+        self._version += 1
+        self._csr = None
+        self._viz_payload = None
+        return len(edges_payload)
+
+    def query_related_entities(self, entity: str, relation: Optional[str] = None, max_hops: int = 1) -> List[Relation]:
+        """查询实体的相关实体，返回(源实体, 源类型, 关系, 目标实体, 目标类型)五元组
+
+        源类型随行返回，调用方不必再逐条回查graph.nodes[src]['type']。
+        """
+        if entity not in self.graph.nodes:
+            return []
+
+        cache_key = (entity, relation, max_hops, self._version)
+        cached = self._query_cache.get(cache_key)
+        if cached is not MISS:
+            return cached
+
+        result = self._query_csr(entity, frozenset((relation,)) if relation else None, max_hops)
+        self._query_cache.set(cache_key, result)
+        return result
+
+    def query_related_entities_batch(self, entities: List[str], relations: Optional[List[str]] = None, max_hops: int = 1) -> Dict[str, List[Relation]]:
+        """批量查询多个实体的相关实体（单次多源遍历，按源实体分组返回）
+
+        行格式与query_related_entities一致：(源实体, 源类型, 关系, 目标实体, 目标类型)。
+        相比逐个调用query_related_entities，把O(|entities|)次往返合并为一次遍历，
+        边数据和节点类型只查一次。relations为None时不过滤关系类型。
+        """
+        relation_set = frozenset(relations) if relations else None
+        # 整个批次共享同一份CSR邻接，遍历全部走数组扫描
+        return {entity: self._query_csr(entity, relation_set, max_hops) for entity in entities}
+
+    def _ensure_csr(self):
+        """惰性构建CSR邻接缓存：indptr + 邻居id数组 + 边类型id数组
+
+        节点名/类型各存一份顺序列表，遍历时按id索引；
+        相比逐边走NetworkX的嵌套字典，热路径变成顺序数组扫描。
+        """
+        if self._csr is not None:
+            return self._csr
+
+        nodes = list(self.graph.nodes)
+        id_of = {n: i for i, n in enumerate(nodes)}
+        node_types = [self.graph.nodes[n].get('type', '') for n in nodes]
+
+        n_edges = self.graph.number_of_edges()
+        indptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+        nbr = np.empty(n_edges, dtype=np.int32)
+        etype = np.empty(n_edges, dtype=np.int16)
+
+        etype_names = []
+        etype_of = {}
+        succ = self.graph.succ
+        e = 0
+        for i, n in enumerate(nodes):
+            for m, data in succ[n].items():
+                rel = data.get('type', '')
+                rel_id = etype_of.get(rel)
+                if rel_id is None:
+                    rel_id = len(etype_names)
+                    etype_of[rel] = rel_id
+                    etype_names.append(rel)
+                nbr[e] = id_of[m]
+                etype[e] = rel_id
+                e += 1
+            indptr[i + 1] = e
+
+        self._csr = (id_of, nodes, node_types, indptr, nbr, etype, etype_names)
+        self._build_hot_cache(nodes, node_types, indptr, nbr, etype, etype_names)
+
+        # 按关系类型分组的邻接索引：rel -> {源实体: (Relation行, ...)}
+        # 单一关系过滤的BFS直接走对应分组，跳过其余7/8的边和逐边类型判断
+        succ_by_rel = {}
+        pred_lists = {n: [] for n in nodes}
+        for i, n in enumerate(nodes):
+            n_type = node_types[i]
+            for v, rel_id in zip(nbr[indptr[i]:indptr[i + 1]].tolist(),
+                                 etype[indptr[i]:indptr[i + 1]].tolist()):
+                rel = etype_names[rel_id]
+                row = Relation(n, n_type, rel, nodes[v], node_types[v])
+                succ_by_rel.setdefault(rel, {}).setdefault(n, []).append(row)
+                pred_lists[nodes[v]].append(n)
+        self._succ_by_rel = succ_by_rel
+        # 前驱表固化为元组，反向BFS/DFS按键直取
+        self._pred = {n: tuple(ps) for n, ps in pred_lists.items()}
+        return self._csr
+
+    def _build_hot_cache(self, nodes, node_types, indptr, nbr, etype, etype_names, top_k: int = 256) -> None:
+        """为高出度的热点节点预物化邻居行
+
+        医疗图谱度分布高度倾斜（"发热"、常见疾病等枢纽节点主导查询成本），
+        把它们的一跳Relation行提前做好，BFS命中时直接取现成元组。
+        """
+        self._hot_neighbors = {}
+        degrees = np.diff(indptr)
+        hot_ids = np.argsort(degrees)[::-1][:top_k].tolist()
+
+        for u in hot_ids:
+            if degrees[u] == 0:
+                break
+            u_name = nodes[u]
+            u_type = node_types[u]
+            lo, hi = indptr[u], indptr[u + 1]
+            nbr_ids = nbr[lo:hi].tolist()
+            rows = tuple(
+                Relation(u_name, u_type, etype_names[rel_id], nodes[v], node_types[v])
+                for v, rel_id in zip(nbr_ids, etype[lo:hi].tolist())
+            )
+            self._hot_neighbors[u] = (rows, nbr_ids)
+
+    def _query_csr(self, entity: str, relation_filter: Optional[frozenset], max_hops: int) -> List[Relation]:
+        """基于CSR邻接的有界BFS，返回Relation行"""
+        id_of, names, node_types, indptr, nbr, etype, etype_names = self._ensure_csr()
+
+        # 单一关系过滤走分组邻接索引：只遍历该类型的边，无需逐边判断
+        if relation_filter is not None and len(relation_filter) == 1:
+            return self._query_by_rel(entity, next(iter(relation_filter)), max_hops)
+
+        start = id_of.get(entity)
+        if start is None:
+            return []
+
+        result = []
+        visited = set()
+        queue = deque([(start, 0)])
+
+        while queue:
+            u, hops = queue.popleft()
+
+            if u in visited or hops > max_hops:
+                continue
+
+            visited.add(u)
+
+            # 热点节点直接用预物化的邻居行，跳过数组扫描和Relation构造
+            hot = self._hot_neighbors.get(u)
+            if hot is not None:
+                rows, nbr_ids = hot
+                for row, v in zip(rows, nbr_ids):
+                    if relation_filter and row.rel not in relation_filter:
+                        continue
+                    result.append(row)
+                    if hops < max_hops:
+                        queue.append((v, hops + 1))
+                continue
+
+            u_name = names[u]
+            u_type = node_types[u]
+
+            lo, hi = indptr[u], indptr[u + 1]
+            # tolist()一次性转回Python int，避免numpy标量的逐元素开销
+            for v, rel_id in zip(nbr[lo:hi].tolist(), etype[lo:hi].tolist()):
+                rel_type = etype_names[rel_id]
+
+                if relation_filter and rel_type not in relation_filter:
+                    continue
+
+                result.append(Relation(u_name, u_type, rel_type, names[v], node_types[v]))
+
+                if hops < max_hops:
+                    queue.append((v, hops + 1))
+
+        return result
+
+    def _query_by_rel(self, entity: str, relation: str, max_hops: int) -> List[Relation]:
+        """沿单一关系类型的有界BFS（基于_succ_by_rel分组索引）"""
+        adj = self._succ_by_rel.get(relation)
+        if not adj:
+            return []
+
+        result = []
+        visited = set()
+        queue = deque([(entity, 0)])
+
+        while queue:
+            u, hops = queue.popleft()
+
+            if u in visited or hops > max_hops:
+                continue
+
+            visited.add(u)
+
+            for row in adj.get(u, ()):
+                result.append(row)
+                if hops < max_hops:
+                    queue.append((row.tgt, hops + 1))
+
+        return result
+
+    def find_paths_multi(self, source: str, targets: List[str], max_length: int = 3) -> Dict[str, List[List[Tuple[str, str, str]]]]:
+        """单源多目标路径查找：一次有界遍历得到source到所有targets的路径
+
+        替代对每个target单独调用find_paths（每次都从头跑一遍遍历），
+        无权图上一次深度受限的遍历即可覆盖全部目标。
+        """
+        target_set = {t for t in targets if t in self.graph.nodes}
+        paths_by_target = {}
+        if source not in self.graph.nodes or not target_set:
+            return paths_by_target
+
+        stack = [(source, [])]
+        while stack:
+            current, relation_path = stack.pop()
+            if relation_path and current in target_set:
+                paths_by_target.setdefault(current, []).append(relation_path)
+            if len(relation_path) >= max_length:
+                continue
+            path_nodes = {source} | {v for _, _, v in relation_path}
+            for neighbor in self.graph.successors(current):
+                if neighbor in path_nodes:
+                    continue
+                rel_type = self.graph.get_edge_data(current, neighbor).get('type', '')
+                stack.append((neighbor, relation_path + [(current, rel_type, neighbor)]))
+
+        return paths_by_target
+
+    def find_pairwise_connections(self, entities: List[str], max_length: int = 2) -> List[Dict]:
+        """查找实体集合内两两之间的关联路径（每个实体只做一次有界遍历）
+
+        替代O(n²)次find_paths调用：从每个实体出发做一次深度受限的DFS，
+        一次性收集到集合中所有后续实体的路径。
+        """
+        connections = []
+        entity_list = list(entities)
+
+        for i, source in enumerate(entity_list):
+            targets = set(entity_list[i+1:])
+            if not targets or source not in self.graph.nodes:
+                continue
+
+            # 一次遍历收集source到所有target的路径
+            paths_by_target = {}
+            stack = [(source, [])]
+            while stack:
+                current, relation_path = stack.pop()
+                if relation_path and current in targets:
+                    paths_by_target.setdefault(current, []).append(relation_path)
+                if len(relation_path) >= max_length:
+                    continue
+                path_nodes = {source} | {v for _, _, v in relation_path}
+                for neighbor in self.graph.successors(current):
+                    if neighbor in path_nodes:
+                        continue
+                    rel_type = self.graph.get_edge_data(current, neighbor).get('type', '')
+                    stack.append((neighbor, relation_path + [(current, rel_type, neighbor)]))
+
+            for target in entity_list[i+1:]:
+                if target in paths_by_target:
+                    connections.append({
+                        "symptom1": source,
+                        "symptom2": target,
+                        "paths": paths_by_target[target]
+                    })
+
+        return connections
+
+    def _ensure_viz_payload(self) -> Dict[str, Tuple[str, str]]:
+        """惰性构建每个节点的可视化载荷：node -> (title, 基础颜色)
+
+        title格式化和颜色映射只依赖节点类型，图不变时结果不变；
+        预编译一次后，visualize每次调用只需处理高亮节点的覆盖。
+        """
+        if self._viz_payload is None:
+            self._viz_payload = {
+                node: (
+                    f"{node}（{ENTITY_TYPES.get(data.get('type', 'Unknown'), data.get('type', 'Unknown'))}）",  # 显示完整类型描述
+                    ENTITY_COLORS.get(data.get('type', 'Unknown'), "#CCCCCC"),  # 未知类型用灰色
+                )
+                for node, data in self.graph.nodes(data=True)
+            }
+        return self._viz_payload
+
+    def visualize(self, filename: str = "knowledge_graph.html",
+                 highlight_entities: Optional[Collection[str]] = None,
+                 max_nodes: int = 100) -> None:
+        """可视化知识图谱（使用ENTITY_COLORS定义的颜色）"""
+        # 高亮实体转为set：每个节点的成员判断O(1)而非O(|entities|)
+        if highlight_entities is not None and not isinstance(highlight_entities, (set, frozenset)):
+            highlight_entities = frozenset(highlight_entities)
+        # 创建可视化网络
+        net = Network(
+            height="800px", 
+            width="100%", 
+            bgcolor="#f8f9fa", 
+            font_color="black",
+            directed=True
+        )
+        
+        # 限制节点数量，避免可视化过于复杂：
+        # 高亮实体强制保留，其余名额按度数从高到低选取，
+        # 而不是按插入顺序截断（那样常把查询关心的实体整个裁掉）
+        node_set = set(highlight_entities or ()) & set(self.graph.nodes)
+        if len(node_set) < max_nodes:
+            budget = max_nodes - len(node_set)
+            for n, _ in sorted(self.graph.degree, key=lambda x: -x[1]):
+                if n in node_set:
+                    continue
+                node_set.add(n)
+                budget -= 1
+                if budget == 0:
+                    break
+
+        # 添加节点：一趟构建平行列表后走pyvis的批量add_nodes，
+        # 避免逐节点调用时的参数校验和重复append开销；
+        # title/基础颜色取自预编译载荷，逐次调用只需处理高亮覆盖
+        payload = self._ensure_viz_payload()
+        ids, labels, colors, titles, sizes = [], [], [], [], []
+        for node in node_set:
+            title, color = payload[node]
+
+            # 如果是需要高亮的实体，使用更亮的颜色
+            highlighted = highlight_entities is not None and node in highlight_entities
+            if highlighted:
+                color = self._lighten_color(color, 30)
+
+            ids.append(node)
+            labels.append(node)
+            titles.append(title)
+            colors.append(color)
+            sizes.append(25 if highlighted else 20)
+
+        net.add_nodes(ids, label=labels, title=titles, color=colors, size=sizes)
+
+        # 添加边（支持新增的关系类型）；nbunch限定出边来源，set判断O(1)
+        # 边字典直接追加进net.edges，绕过add_edge的逐条节点存在性校验
+        rel_descriptions = self.relation_type_descriptions
+        edges = net.edges
+        for u, v, data in self.graph.edges(node_set, data=True):
+            if v in node_set:
+                rel_type = data.get('type', '')
+                edges.append({
+                    "from": u,
+                    "to": v,
+                    "label": rel_descriptions.get(rel_type, rel_type),
+                    "color": "#AAAAAA",
+                    "width": 2
+                })
+        
+        # 配置物理引擎
+        net.set_options("""
+        var options = {
+            "physics": {
+                "forceAtlas2Based": {
+                    "springLength": 100
+                },
+                "minVelocity": 0.75,
+                "solver": "forceAtlas2Based",
+                "timestep": 0.35
+            }
+        }
+        """)
+        
+        # 保存可视化结果
+        net.write_html(filename)
+        print(f"知识图谱可视化已保存到 {filename}")
+
+    def find_paths(self, source: str, target: str, max_length: int = 3) -> List[List[Tuple[str, str, str]]]:
+        """查找source到target的简单路径（双向BFS，正反两侧在中点会合）
+
+        单向DFS的探索量随深度指数膨胀；从两端各走一半深度再拼接，
+        前沿规模近似开方。深度大于5时退回NetworkX实现。
+        """
+        if source not in self.graph.nodes or target not in self.graph.nodes:
+            return []
+
+        # 同一会话内诊断会反复查询相同的(疾病, 症状)对，结果按图版本缓存
+        cache_key = ('find_paths', source, target, max_length, self._version)
+        cached = self._query_cache.get(cache_key)
+        if cached is not MISS:
+            return cached
+
+        try:
+            if max_length > 5:
+                node_paths = nx.all_simple_paths(self.graph, source=source, target=target, cutoff=max_length)
+            else:
+                node_paths = self._bidirectional_simple_paths(source, target, max_length)
+
+            paths = []
+            get_edge = self.graph.get_edge_data
+            for path in node_paths:
+                relation_path = [
+                    (path[i], get_edge(path[i], path[i + 1]).get('type', ''), path[i + 1])
+                    for i in range(len(path) - 1)
+                ]
+                if relation_path:
+                    paths.append(relation_path)
+            self._query_cache.set(cache_key, paths)
+            return paths
+        except Exception as e:
+            print(f"查找路径失败: {str(e)}")
+            return []
+
+    def _bidirectional_simple_paths(self, source: str, target: str, cutoff: int) -> List[List[str]]:
+        """枚举source到target长度不超过cutoff的简单路径（节点序列）
+
+        正向从source、反向从target各枚举一半深度的简单路径，
+        按会合节点配对拼接，去重后返回。
+        """
+        if source == target:
+            return []
+
+        half_fwd = (cutoff + 1) // 2
+        half_bwd = cutoff // 2
+
+        def _collect(start, adj, depth_limit):
+            """深度受限DFS，按末端节点归组所有简单路径"""
+            by_end = {}
+            stack = [(start, (start,))]
+            while stack:
+                node, path = stack.pop()
+                by_end.setdefault(node, []).append(path)
+                if len(path) - 1 >= depth_limit:
+                    continue
+                for neighbor in adj[node]:
+                    if neighbor not in path:
+                        stack.append((neighbor, path + (neighbor,)))
+            return by_end
+
+        self._ensure_csr()
+        fwd_by_end = _collect(source, self.graph.succ, half_fwd)
+        bwd_by_end = _collect(target, self._pred, half_bwd)
+
+        results = set()
+        for meet, fwd_paths in fwd_by_end.items():
+            bwd_paths = bwd_by_end.get(meet)
+            if not bwd_paths:
+                continue
+            for fwd in fwd_paths:
+                fwd_nodes = set(fwd)
+                for bwd in bwd_paths:
+                    # 总长度受限，且除会合点外两段不得重叠（保持简单路径）
+                    if (len(fwd) - 1) + (len(bwd) - 1) > cutoff:
+                        continue
+                    if any(n in fwd_nodes for n in bwd[:-1]):
+                        continue
+                    results.add(fwd + tuple(reversed(bwd[:-1])))
+
+        return [list(p) for p in results]
+
+    def get_node_relations(self, node: str) -> Dict[str, List]:
+        """返回节点的入边、出边及相连实体（基于预物化的邻接缓存）
+
+        出边行取自CSR查询，入边沿前驱表回查边类型，
+        供诊断代理和可视化路径使用，不直接触碰NetworkX内部结构。
+        """
+        if node not in self.graph.nodes:
+            return {"incoming": [], "outgoing": [], "connected": []}
+
+        self._ensure_csr()
+        outgoing = self._query_csr(node, None, 1)
+
+        get_edge = self.graph.get_edge_data
+        get_type = self.graph.nodes.__getitem__
+        incoming = [
+            Relation(p, get_type(p).get('type', ''),
+                     get_edge(p, node).get('type', ''),
+                     node, get_type(node).get('type', ''))
+            for p in self._pred.get(node, ())
+        ]
+
+        connected = list(dict.fromkeys(
+            [row.tgt for row in outgoing] + [row.src for row in incoming]
+        ))
+        return {"incoming": incoming, "outgoing": outgoing, "connected": connected}
+
+    def get_entity_type(self, entity: str) -> Optional[str]:
+        if entity in self.graph.nodes:
+            return self.graph.nodes[entity].get('type')
+        return None
+
+    def get_all_entities(self, entity_type: Optional[str] = None) -> List[str]:
+        if entity_type:
+            return [node for node, data in self.graph.nodes(data=True) if data.get('type') == entity_type]
+        return list(self.graph.nodes)
+
+    def save_to_file(self, filename: str) -> bool:
+        try:
+            with open(filename, 'wb') as f:
+                # 协议5：更紧凑的流、更少的拷贝，显著加快每次启动时的加载
+                pickle.dump(self.graph, f, protocol=pickle.HIGHEST_PROTOCOL)
+            print(f"知识图谱已保存到 {filename}")
+            return True
+        except Exception as e:
+            print(f"保存知识图谱失败: {str(e)}")
+            return False
+
+    def load_from_file(self, filename: str) -> bool:
+        try:
+            if not os.path.exists(filename):
+                print(f"知识图谱文件 {filename} 不存在")
+                return False
+                
+            with open(filename, 'rb') as f:
+                self.graph = pickle.load(f)
+            # pickle反序列化出的type/label都是独立字符串，整图重新驻留一遍
+            for _, data in self.graph.nodes(data=True):
+                if 'type' in data:
+                    data['type'] = sys.intern(data['type'])
+                if 'label' in data:
+                    data['label'] = sys.intern(data['label'])
+            for _, _, data in self.graph.edges(data=True):
+                if 'type' in data:
+                    data['type'] = sys.intern(data['type'])
+                if 'label' in data:
+                    data['label'] = sys.intern(data['label'])
+            self._version += 1
+            self._csr = None
+            self._viz_payload = None
+            print(f"已从 {filename} 加载知识图谱，包含 {len(self.graph.nodes)} 个实体和 {len(self.graph.edges)} 个关系")
+            return True
+        except Exception as e:
+            print(f"加载知识图谱失败: {str(e)}")
+            return False
+
+    def _lighten_color(self, color: str, percent: int) -> str:
+        """把#RRGGBB颜色向白色提亮percent%（纯整数运算，无matplotlib依赖）"""
+        rgb = _HEX_CACHE.get(color)
+        if rgb is None:
+            rgb = (int(color[1:3], 16), int(color[3:5], 16), int(color[5:7], 16))
+            _HEX_CACHE[color] = rgb
+        f = percent / 100.0
+        r = min(255, int(rgb[0] + (255 - rgb[0]) * f))
+        g = min(255, int(rgb[1] + (255 - rgb[1]) * f))
+        b = min(255, int(rgb[2] + (255 - rgb[2]) * f))
+        return f"#{r:02x}{g:02x}{b:02x}"
@@ -1,5 +1,6 @@
 # graph_schema.py
 """定义医疗知识图谱中的实体类型和关系类型"""
+import sys
 
 ENTITY_TYPES = {
     "Symptom": "症状（如发热、咳嗽、头痛等）",
@@ -22,6 +23,15 @@ RELATION_TYPES = {
     "HAS_SYMPTOM": "有症状（疾病→症状）"
 }
 
+# 驻留schema字符串：类型名和描述在每个节点/边的属性字典里反复出现，
+# 驻留后相等的字符串共享同一对象，比较退化为指针比较且只存一份
+ENTITY_TYPES = {sys.intern(k): sys.intern(v) for k, v in ENTITY_TYPES.items()}
+RELATION_TYPES = {sys.intern(k): sys.intern(v) for k, v in RELATION_TYPES.items()}
+
+# 类型短描述（括号前的部分），模块导入时构建一次，所有图谱实例共享
+ENTITY_TYPE_DESCRIPTIONS = {k: sys.intern(v.split("（", 1)[0]) for k, v in ENTITY_TYPES.items()}
+RELATION_TYPE_DESCRIPTIONS = {k: sys.intern(v.split("（", 1)[0]) for k, v in RELATION_TYPES.items()}
+
 # 实体类型颜色映射，用于可视化
 ENTITY_COLORS = {
     "Symptom": "#FF9999",
@@ -1,7 +1,11 @@
+import io
 import os
 import logging
+import threading
+import uuid
 import gradio as gr
 import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Dict, List
 from init_knowledge_base import initialize_medical_knowledge
@@ -19,33 +23,44 @@ diagnosis_agent = None
 visualization_agent = None
 ernie_client = None
 
+# 多个浏览器会话的demo.load会并发触发init_system，
+# 加锁保证重量级初始化（加载/构建图谱）整个进程只做一次
+_init_lock = threading.Lock()
+_init_status = None
+
 def init_system():
-    """初始化系统组件"""
+    """初始化系统组件（进程内只执行一次，后续会话直接复用）"""
     global graph_kb, retrieval_agent, diagnosis_agent, visualization_agent, ernie_client
-    
-    # 初始化知识图谱
-    graph_kb = initialize_medical_knowledge()
-    
-    # 初始化ERNIE客户端（连接本地VL模型）
-    ernie_client = ErnieClient(
-        host="0.0.0.0",
-        port="8180",
-        model_name="local-vl-model",
-        graph_kb=graph_kb
-    )
-    
-    # 测试模型连接
-    if not ernie_client.test_connection():
-        logger.warning("无法连接到本地模型服务，功能可能受限")
-        return "系统初始化完成，但模型连接失败，请检查本地服务"
-    
-    # 初始化智能代理
-    retrieval_agent = KnowledgeRetrievalAgent(graph_kb)
-    diagnosis_agent = DiagnosisAgent(ernie_client, retrieval_agent)
-    visualization_agent = VisualizationAgent(graph_kb, ernie_client)  # 初始化可视化代理
-    
-    logger.info("系统初始化完成")
-    return "系统初始化完成，可开始诊断"
+    global _init_status
+
+    with _init_lock:
+        if _init_status is not None:
+            return _init_status
+
+        # 初始化知识图谱（只加载/构建图谱本身，不做全图可视化导出）
+        graph_kb = initialize_medical_knowledge()
+
+        # 初始化ERNIE客户端（连接本地VL模型）
+        ernie_client = ErnieClient(
+            host="0.0.0.0",
+            port="8180",
+            model_name="local-vl-model",
+            graph_kb=graph_kb
+        )
+
+        # 初始化智能代理（先于连接测试，模型不可用时图谱相关功能仍可工作）
+        retrieval_agent = KnowledgeRetrievalAgent(graph_kb)
+        diagnosis_agent = DiagnosisAgent(ernie_client, retrieval_agent)
+        visualization_agent = VisualizationAgent(graph_kb, ernie_client)  # 初始化可视化代理
+
+        # 测试模型连接
+        if not ernie_client.test_connection():
+            logger.warning("无法连接到本地模型服务，功能可能受限")
+            _init_status = "系统初始化完成，但模型连接失败，请检查本地服务"
+        else:
+            logger.info("系统初始化完成")
+            _init_status = "系统初始化完成，可开始诊断"
+        return _init_status
 
 def process_query(symptoms: List[str], medical_history: str) -> Dict:
     """处理提取到的症状列表"""
@@ -57,73 +72,81 @@ def process_query(symptoms: List[str], medical_history: str) -> Dict:
     return result
 
 def format_result(result: Dict) -> str:
-    """格式化诊断结果为Markdown"""
+    """格式化诊断结果为Markdown（StringIO单缓冲写出，免去列表+join的中间分配）"""
     if "error" in result:
         return result["error"]
-    
-    report = []
-    
+
+    buf = io.StringIO()
+    w = buf.write
+
     # 基本信息
-    report.append("## 🏥 诊断报告")
-    report.append(f"**提取的症状**: {', '.join(result['symptoms'])}")
+    w("## 🏥 诊断报告\n")
+    w(f"**提取的症状**: {', '.join(result['symptoms'])}\n")
     if result['medical_history']:
-        report.append(f"**病史**: {result['medical_history']}")
-    report.append("")
-    
+        w(f"**病史**: {result['medical_history']}\n")
+    w("\n")
+
     # 图像分析结果（如果有）
     if "image_analysis" in result:
-        report.append("### 📊 图像分析结果")
-        report.append(result["image_analysis"])
-        report.append("")
-    
+        w("### 📊 图像分析结果\n")
+        w(result["image_analysis"])
+        w("\n\n")
+
     # 风险分析
-    report.append("### ⚠️ 风险评估")
+    w("### ⚠️ 风险评估\n")
     risk = result['risk_analysis']
-    report.append(f"**风险等级**: {'★' * risk['risk_level']} (共5级)")
-    report.append(f"**就医建议**: {risk['urgency']}")
-    report.append("**具体建议**:")
+    w(f"**风险等级**: {'★' * risk['risk_level']} (共5级)\n")
+    w(f"**就医建议**: {risk['urgency']}\n")
+    w("**具体建议**:\n")
     for i, rec in enumerate(risk['recommendations'], 1):
-        report.append(f"{i}. {rec}")
-    report.append("")
-    
+        w(f"{i}. {rec}\n")
+    w("\n")
+
     # 治疗方案
     plan = result['diagnosis']
-    report.append("### 💊 治疗方案")
-    report.append("**推荐检查项目**:")
+    w("### 💊 治疗方案\n")
+    w("**推荐检查项目**:\n")
     for i, exam in enumerate(plan.get('examinations', []), 1):
-        report.append(f"{i}. {exam}")
-    report.append("")
-    
-    report.append("**用药建议**:")
+        w(f"{i}. {exam}\n")
+    w("\n")
+
+    w("**用药建议**:\n")
     for i, med in enumerate(plan.get('medications', []), 1):
-        report.append(f"{i}. {med}")
-    report.append("")
-    
-    report.append("**生活建议**:")
+        w(f"{i}. {med}\n")
+    w("\n")
+
+    w("**生活建议**:\n")
     for i, life in enumerate(plan.get('lifestyle', []), 1):
-        report.append(f"{i}. {life}")
-    
+        w(f"{i}. {life}\n")
+
     # 免责声明
-    report.append("\n> ⚠️ 免责声明：本结果仅供参考，不替代专业医疗诊断")
-    
-    return "\n".join(report)
+    w("\n> ⚠️ 免责声明：本结果仅供参考，不替代专业医疗诊断")
+
+    return buf.getvalue()
+
+# 可视化导出线程池：Pyvis序列化+写盘是请求路径上最慢的一步，
+# 扔到后台线程后Gradio立刻返回链接，文件稍后就绪
+_viz_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="viz-export")
 
 def visualize_knowledge(symptoms: List[str]) -> str:
-    """可视化与症状相关的知识图谱"""
+    """可视化与症状相关的知识图谱（后台线程生成，不阻塞请求）"""
     if not graph_kb:
         return "知识图谱尚未初始化"
-    
+
     if not symptoms:
         return "未提取到症状，无法生成知识图谱"
-    
-    # 生成可视化文件
-    graph_kb.visualize(
-        filename="symptom_related_kg.html",
+
+    # 每次请求独立文件名，避免并发用户互相覆盖
+    filename = f"symptom_related_kg_{uuid.uuid4().hex}.html"
+    _viz_pool.submit(
+        graph_kb.visualize,
+        filename=filename,
         highlight_entities=symptoms,
         max_nodes=50
     )
-    
-    return f"已生成与症状相关的知识图谱：<a href='symptom_related_kg.html' target='_blank'>查看图谱</a>"
+
+    return (f"正在生成与症状相关的知识图谱，稍后刷新查看："
+            f"<a href='{filename}' target='_blank'>查看图谱</a>")
 
 def create_interface():
     """创建Gradio界面（支持自然语言+图像输入）"""
@@ -1,30 +1,196 @@
 import os
-import base64
+import asyncio
+import binascii
+import functools
 import json
-from openai import OpenAI
+import tempfile
+import httpx
+from collections import OrderedDict
+from openai import OpenAI, AsyncOpenAI
 from typing import List, Dict, Optional
 
+# Shared pooled transports, one per endpoint. Constructing ErnieClient
+# per request would otherwise spawn a fresh connection pool each time,
+# leaking sockets and re-paying TCP handshakes; the OpenAI wrapper itself
+# is cheap, so only the transport is memoized.
+# Static instruction blocks sent as system prompts. Keeping them
+# byte-identical across calls, with all dynamic data in the user message,
+# lets prefix-caching backends (vLLM/SGLang-style) reuse the prefilled KV
+# for the bulk of every prompt.
+SYMPTOM_SYS_PROMPT = """Please extract key symptoms from the medical description provided by the user, with requirements:
+1. Each symptom should be a concise medical term or descriptive word
+2. The return format must be a strict JSON array with double quotes, e.g.: ["fever", "cough", "fatigue"]
+3. Do not include any additional explanatory text
+4. Extract at most 10 most important symptoms
+5. Directly return the symptom list"""
+
+RISK_SYS_PROMPT = """Please act as a professional medical risk assessment expert and evaluate the patient's risk level based on the information provided by the user.
+
+Please return the assessment result as a strict JSON object with double quotes, including the following fields:
+- risk_level: Integer from 1-5 (1=very low risk, 2=low risk, 3=medium risk, 4=high risk, 5=urgent)
+- urgency: Medical consultation recommendation (e.g.: "Recommend observation", "Routine clinic visit", "Emergency visit", "Immediate medical attention")
+- recommendations: List of recommendations (3-5 specific suggestions)
+
+Example format:
+{
+    "risk_level": 3,
+    "urgency": "Recommend routine clinic visit",
+    "recommendations": [
+        "It is advisable to seek medical examination in a timely manner",
+        "Rest appropriately and avoid overexertion", 
+        "Keep the affected area clean",
+        "Closely monitor symptom changes"
+    ]
+}
+
+Directly return the dictionary."""
+
+PLAN_SYS_PROMPT = """Please act as a professional medical consultant and generate a treatment recommendation plan based on the symptom information provided by the user.
+
+Please return the treatment plan as a strict JSON object with double quotes, including the following fields:
+- examinations: List of recommended examination items (3-5 items)
+- medications: List of medication recommendations (Note: Only general recommendations can be given, not specific prescription drugs)
+- lifestyle: List of lifestyle recommendations (4-6 items)
+
+Example format:
+{
+    "examinations": [
+        "Complete blood count test",
+        "Relevant specialist examinations",
+        "Imaging examinations"
+    ],
+    "medications": [
+        "Please take medication as prescribed by your doctor",
+        "Symptomatic treatment may be considered",
+        "Avoid self-medication"
+    ],
+    "lifestyle": [
+        "Adequate rest and avoid overexertion",
+        "Keep the affected area clean and hygienic",
+        "Eat light meals and drink plenty of water",
+        "Avoid irritating foods"
+    ]
+}
+
+Directly return the dictionary."""
+
+# Message-part factories for multimodal content; hoisted so the message
+# builder assembles parts without rebuilding dict literals inline
+def _image_part(url: str) -> Dict:
+    return {"type": "image_url", "image_url": {"url": url}}
+
+def _text_part(text: str) -> Dict:
+    return {"type": "text", "text": text}
+
+def _strip_fences(text: str) -> str:
+    """Strip markdown code fences and language tags from model output"""
+    text = text.strip()
+    if text.startswith("```") and text.endswith("```"):
+        text = text[3:-3].strip()
+    for tag in ("json", "python"):
+        if text.startswith(tag):
+            text = text[len(tag):].strip()
+    return text
+
+def _parse_json(text: str):
+    """Parse model output as strict JSON after removing fences
+
+    json.loads replaces the old eval() calls: no arbitrary code execution
+    and no per-response compile+exec cost.
+    """
+    return json.loads(_strip_fences(text))
+
+@functools.lru_cache(maxsize=8)
+def _get_http_client(base_url: str) -> httpx.Client:
+    return httpx.Client(
+        limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+        timeout=httpx.Timeout(60.0)
+    )
+
+@functools.lru_cache(maxsize=8)
+def _get_async_http_client(base_url: str) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+        timeout=httpx.Timeout(60.0)
+    )
+
 class ErnieClient:
-    def __init__(self, host: str = "0.0.0.0", port: str = "8180"):
+    _IMAGE_ANALYSIS_PROMPT = """Please act as a professional medical imaging analysis assistant and detailedly describe the visible symptom characteristics in this medical image, including:
+1. Location and distribution of lesions
+2. Morphological features (size, shape, boundaries, etc.)
+3. Color and texture changes
+4. Possible pathological features
+5. Abnormal signs requiring attention
+
+Please describe using professional yet understandable language."""
+
+    # Bound on the exact-match response cache (L1)
+    _RESPONSE_CACHE_SIZE = 1024
+
+    def __init__(self, host: str = "0.0.0.0", port: str = "8180",
+                 http_client: Optional[httpx.Client] = None,
+                 async_http_client: Optional[httpx.AsyncClient] = None,
+                 semantic_cache=None):
         """
         Initialize the ERNIE client
         
         Args:
             host: Host address of the ERNIE service
             port: Port number of the ERNIE service
+            http_client: Optional pooled httpx.Client shared with the caller;
+                created here with keep-alive limits if not provided
+            async_http_client: Optional pooled httpx.AsyncClient, same idea
+            semantic_cache: Optional object with get(prompt)/set(prompt,
+                response), e.g. KnowledgeBase.llm_cache; serves completions
+                for semantically close prompts without an LLM round-trip
         """
         self.host = host
         self.port = port
+        # Two-tier response cache for text_generation: L1 exact-match LRU
+        # here, L2 embedding-based semantic cache when one is wired in
+        self._response_cache = OrderedDict()
+        self.semantic_cache = semantic_cache
+        # Curated symptom terms (lowercased) for keyword extraction; when
+        # populated, analyze_symptoms matches against it and only falls
+        # back to the LLM on zero hits
+        self.symptom_lexicon = []
         self.base_url = f"http://{host}:{port}/v1"
+        # A consultation issues several model calls back to back; pooled
+        # keep-alive connections amortise the TCP handshake across them
+        # instead of paying it on every request. Absent an injected
+        # client, the pool is shared module-wide per endpoint so stray
+        # ErnieClient() constructions cannot leak pools
+        if http_client is None:
+            http_client = _get_http_client(self.base_url)
+        if async_http_client is None:
+            async_http_client = _get_async_http_client(self.base_url)
+        self.http_client = http_client
+        self.async_http_client = async_http_client
         self.client = OpenAI(
             api_key="null",
-            base_url=self.base_url
+            base_url=self.base_url,
+            http_client=self.http_client
+        )
+        # Async client sharing the same endpoint; lets the coordinator
+        # fan out independent requests on one event loop
+        self.async_client = AsyncOpenAI(
+            api_key="null",
+            base_url=self.base_url,
+            http_client=self.async_http_client
         )
     
+    # Chunk size for incremental base64 encoding; a multiple of 57 bytes
+    # (76 output chars) so chunk boundaries never introduce padding
+    _ENCODE_CHUNK_SIZE = 57 * 4096
+
     def encode_image(self, image_path: str) -> str:
         """
         Convert image to base64 encoding
         
+        Reads and encodes in fixed-size chunks instead of slurping the
+        whole file: a large medical image no longer doubles peak memory
+        (raw bytes plus encoded copy held at once).
+        
         Args:
             image_path: Path to the image file
             
@@ -32,15 +198,22 @@ class ErnieClient:
             Base64-encoded image string
         """
         try:
+            out = bytearray()
             with open(image_path, "rb") as image_file:
-                return base64.b64encode(image_file.read()).decode('utf-8')
+                while chunk := image_file.read(self._ENCODE_CHUNK_SIZE):
+                    out += binascii.b2a_base64(chunk, newline=False)
+            return out.decode('ascii')
         except Exception as e:
             raise Exception(f"Image encoding failed: {str(e)}")
     
-    def chat_completion(self, messages: List[Dict], stream: bool = True) -> str:
+    def chat_completion(self, messages: List[Dict], stream: bool = False) -> str:
         """
         Basic chat completion method
         
+        Every caller here assembles the full response string anyway, so
+        the default is a single non-streaming JSON response: no SSE
+        parsing and no chunk reassembly on the hot path.
+        
         Args:
             messages: List of messages
             stream: Whether to use streaming response
@@ -49,20 +222,105 @@ class ErnieClient:
             Complete response text
         """
         try:
+            if stream:
+                return self._stream_raw_sse(messages)
             completion = self.client.chat.completions.create(
                 model="null",
                 messages=messages,
-                stream=stream
+                stream=False
             )
+            return completion.choices[0].message.content
+        except Exception as e:
+            return f"Request failed: {str(e)}"
+
+    def _stream_raw_sse(self, messages: List[Dict]) -> str:
+        """
+        Stream a completion over raw SSE and hand-parse the deltas
+        
+        The SDK validates a ChatCompletionChunk pydantic model per token;
+        for long responses that is pure per-chunk overhead when only
+        choices[0].delta.content is needed. Chunks accumulate in a list
+        and join once, so assembly stays linear.
+        
+        Args:
+            messages: List of messages
             
-            if stream:
-                result = ""
-                for chunk in completion:
-                    if chunk.choices and chunk.choices[0].delta.content:
-                        result += chunk.choices[0].delta.content
-                return result
-            else:
-                return completion.choices[0].message.content
+        Returns:
+            Complete response text
+        """
+        parts = []
+        with self.http_client.stream(
+            "POST",
+            f"{self.base_url}/chat/completions",
+            json={"model": "null", "messages": messages, "stream": True}
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line.startswith("data: "):
+                    continue
+                data = line[6:]
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or []
+                if choices:
+                    content = choices[0].get("delta", {}).get("content")
+                    if content:
+                        parts.append(content)
+        return "".join(parts)
+
+    async def _raw_post(self, payload: Dict) -> Dict:
+        """
+        POST a payload straight to the chat completions endpoint
+        
+        Bypasses the OpenAI SDK's request building and pydantic response
+        validation, which become measurable overhead when many patients
+        are processed concurrently; the shared pooled httpx client is
+        reused, so no extra connections are opened.
+        
+        Args:
+            payload: JSON body for /chat/completions
+            
+        Returns:
+            Decoded JSON response
+        """
+        response = await self.async_http_client.post(
+            f"{self.base_url}/chat/completions",
+            json=payload
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def achat_completion(self, messages: List[Dict], stream: bool = False) -> str:
+        """
+        Basic chat completion method (async variant of chat_completion)
+        
+        Args:
+            messages: List of messages
+            stream: Whether to use streaming response
+            
+        Returns:
+            Complete response text
+        """
+        try:
+            if not stream:
+                # Non-streaming calls skip the SDK entirely
+                data = await self._raw_post({
+                    "model": "null",
+                    "messages": messages,
+                    "stream": False
+                })
+                return data["choices"][0]["message"]["content"]
+            
+            completion = await self.async_client.chat.completions.create(
+                model="null",
+                messages=messages,
+                stream=True
+            )
+            parts = []
+            async for chunk in completion:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+            return "".join(parts)
         except Exception as e:
             return f"Request failed: {str(e)}"
     
@@ -77,6 +335,10 @@ class ErnieClient:
         Returns:
             Generated text
         """
+        short_circuit = self._should_short_circuit(prompt)
+        if short_circuit is not None:
+            return short_circuit
+        
         messages = []
         
         if system_prompt:
@@ -90,7 +352,113 @@ class ErnieClient:
             "content": prompt
         })
         
-        return self.chat_completion(messages)
+        cache_key = (prompt, system_prompt)
+        sem_key = self._semantic_key(prompt, system_prompt)
+        cached = self._cache_lookup(cache_key, sem_key)
+        if cached is not None:
+            return cached
+
+        result = self.chat_completion(messages)
+        self._cache_store(cache_key, sem_key, result)
+        return result
+
+    def _should_short_circuit(self, prompt: str) -> Optional[str]:
+        """
+        Return a canned response for inputs not worth a model call
+        
+        Empty, whitespace-only, or near-empty prompts would cost a full
+        network round-trip just to produce an unusable answer; answering
+        them locally also keeps junk traffic cheap. Returns None when the
+        prompt should proceed to the model.
+        """
+        if prompt is None:
+            return ""
+        stripped = prompt.strip()
+        if len(stripped) < 5:
+            return ""
+        return None
+
+    @staticmethod
+    def _semantic_key(prompt: str, system_prompt: Optional[str]) -> str:
+        """Text embedded for the semantic cache tier
+
+        The system prompt is part of the key: the risk and plan user
+        prompts wrap an identical symptoms+medical_info payload in nearly
+        the same words, so embedding the user prompt alone lands them
+        within the similarity threshold and a cached risk answer could be
+        served as a treatment plan. Prefixing the task's system prompt
+        keeps different tasks far apart in embedding space.
+        """
+        return f"{system_prompt}\n{prompt}" if system_prompt else prompt
+
+    def _cache_lookup(self, cache_key, sem_key: str) -> Optional[str]:
+        """Check the exact-match L1, then the semantic L2 if wired in"""
+        cached = self._response_cache.get(cache_key)
+        if cached is not None:
+            self._response_cache.move_to_end(cache_key)
+            return cached
+        if self.semantic_cache is not None:
+            hit = self.semantic_cache.get(sem_key)
+            if hit is not None:
+                # Promote to L1 so repeats of this exact prompt stay cheap
+                self._response_cache[cache_key] = hit
+                return hit
+        return None
+
+    def _cache_store(self, cache_key, sem_key: str, result: str) -> None:
+        """Record a completion in both cache tiers"""
+        # Never cache transport errors: chat_completion returns
+        # "Request failed: ..." strings on failure, and persisting one
+        # would replay the outage for this prompt (and, via the semantic
+        # tier, similar prompts) long after the backend recovered
+        if not result or result.startswith("Request failed"):
+            return
+        self._response_cache[cache_key] = result
+        self._response_cache.move_to_end(cache_key)
+        while len(self._response_cache) > self._RESPONSE_CACHE_SIZE:
+            self._response_cache.popitem(last=False)
+        if self.semantic_cache is not None:
+            self.semantic_cache.set(sem_key, result)
+
+    async def atext_generation(self, prompt: str, system_prompt: str = None) -> str:
+        """
+        Pure text generation (async variant of text_generation)
+        
+        Args:
+            prompt: User input prompt
+            system_prompt: System prompt (optional)
+            
+        Returns:
+            Generated text
+        """
+        messages = []
+        
+        if system_prompt:
+            messages.append({
+                "role": "system",
+                "content": system_prompt
+            })
+        
+        messages.append({
+            "role": "user",
+            "content": prompt
+        })
+        
+        short_circuit = self._should_short_circuit(prompt)
+        if short_circuit is not None:
+            return short_circuit
+        
+        # Semantic lookups hit ChromaDB synchronously, so they run in a
+        # worker thread to keep the event loop free
+        cache_key = (prompt, system_prompt)
+        sem_key = self._semantic_key(prompt, system_prompt)
+        cached = await asyncio.to_thread(self._cache_lookup, cache_key, sem_key)
+        if cached is not None:
+            return cached
+
+        result = await self.achat_completion(messages)
+        await asyncio.to_thread(self._cache_store, cache_key, sem_key, result)
+        return result
     
     def analyze_image_and_text(self, text: str = None, image_path: str = None) -> str:
         """
@@ -103,37 +471,60 @@ class ErnieClient:
         Returns:
             Analysis result
         """
-        if not text and not image_path:
-            return "Please provide text or image for analysis"
+        messages, error = self._build_multimodal_messages(text, image_path)
+        if error:
+            return error
+        
+        return self.chat_completion(messages)
+
+    async def aanalyze_image_and_text(self, text: str = None, image_path: str = None) -> str:
+        """
+        Analyze image and text (async variant of analyze_image_and_text)
+        
+        Args:
+            text: Text description
+            image_path: Image path
+            
+        Returns:
+            Analysis result
+        """
+        # Message building includes file I/O and base64 encoding, so it
+        # runs in a worker thread to keep the event loop free
+        messages, error = await asyncio.to_thread(self._build_multimodal_messages, text, image_path)
+        if error:
+            return error
+        
+        return await self.achat_completion(messages)
+
+    def _build_multimodal_messages(self, text: str = None, image_path: str = None):
+        """
+        Build the multimodal message list shared by the sync and async paths
+        
+        Returns:
+            (messages, error): error is None on success, otherwise a
+            user-facing message and messages is None
+        """
+        # Two-bit input switch: the four (has_text, has_image) shapes are
+        # decided up front so the assembly below is branch-light
+        has_text, has_image = bool(text), bool(image_path)
+        if not has_text and not has_image:
+            return None, "Please provide text or image for analysis"
         
         content = []
         
-        # Add image content
-        if image_path:
+        # Add image content as an inline data URL - the only image_url
+        # form OpenAI-compatible chat endpoints accept besides http(s)
+        if has_image:
             try:
-                base64_image = self.encode_image(image_path)
-                content.append({
-                    "type": "image_url",
-                    "image_url": {
-                        "url": f"data:image/jpeg;base64,{base64_image}"
-                    }
-                })
+                content.append(_image_part(
+                    f"data:image/jpeg;base64,{self.encode_image(image_path)}"))
             except Exception as e:
-                return f"Image processing failed: {str(e)}"
+                return None, f"Image processing failed: {str(e)}"
         
-        # Add text content
-        if text:
-            content.append({
-                "type": "text",
-                "text": text
-            })
+        if has_text:
+            content.append(_text_part(text))
         
-        messages = [{
-            "role": "user",
-            "content": content
-        }]
-        
-        return self.chat_completion(messages)
+        return [{"role": "user", "content": content}], None
     
     def medical_image_analysis(self, image_path: str, custom_prompt: str = None) -> str:
         """
@@ -146,18 +537,24 @@ class ErnieClient:
         Returns:
             Medical image analysis result
         """
-        default_prompt = """Please act as a professional medical imaging analysis assistant and detailedly describe the visible symptom characteristics in this medical image, including:
-1. Location and distribution of lesions
-2. Morphological features (size, shape, boundaries, etc.)
-3. Color and texture changes
-4. Possible pathological features
-5. Abnormal signs requiring attention
+        prompt = custom_prompt if custom_prompt else self._IMAGE_ANALYSIS_PROMPT
+        
+        return self.analyze_image_and_text(text=prompt, image_path=image_path)
 
-Please describe using professional yet understandable language."""
+    async def amedical_image_analysis(self, image_path: str, custom_prompt: str = None) -> str:
+        """
+        Professional medical image analysis (async variant)
         
-        prompt = custom_prompt if custom_prompt else default_prompt
+        Args:
+            image_path: Path to the medical image
+            custom_prompt: Custom analysis prompt
+            
+        Returns:
+            Medical image analysis result
+        """
+        prompt = custom_prompt if custom_prompt else self._IMAGE_ANALYSIS_PROMPT
         
-        return self.analyze_image_and_text(text=prompt, image_path=image_path)
+        return await self.aanalyze_image_and_text(text=prompt, image_path=image_path)
     
     def analyze_symptoms(self, text: str) -> List[str]:
         """
@@ -169,29 +566,56 @@ Please describe using professional yet understandable language."""
         Returns:
             List of symptom keywords
         """
-        prompt = f"""Please extract key symptoms from the following medical description, with requirements:
-1. Each symptom should be a concise medical term or descriptive word
-2. The return format must be a Python list, e.g.: ["fever", "cough", "fatigue"]
-3. Do not include any additional explanatory text
-4. Extract at most 10 most important symptoms
-
-Patient description: {text}
+        lexicon_hits = self._match_symptom_lexicon(text)
+        if lexicon_hits:
+            return lexicon_hits
+        result = self.text_generation(self._build_symptom_prompt(text), system_prompt=SYMPTOM_SYS_PROMPT)
+        return self._parse_symptom_result(result)
 
-Please directly return the symptom list:"""
+    def _match_symptom_lexicon(self, text: str) -> List[str]:
+        """
+        Match the input against the known symptom vocabulary
         
-        result = self.text_generation(prompt)
+        The symptom vocabulary is small and finite, so a substring scan
+        over the stored terms answers the common case without an LLM
+        round-trip; the model is only consulted when nothing matches.
         
-        try:
-            # Clean possible extra characters
-            result = result.strip()
-            # Remove possible code block markers
-            if result.startswith("```") and result.endswith("```"):
-                result = result[3:-3].strip()
-            if result.startswith("python"):
-                result = result[6:].strip()
+        Args:
+            text: Symptom description text
             
-            # Attempt to parse as Python list
-            symptoms = eval(result)
+        Returns:
+            Up to 10 matched symptom terms, or an empty list
+        """
+        if not self.symptom_lexicon or not text:
+            return []
+        lowered = text.lower()
+        hits = [term for term in self.symptom_lexicon if term.lower() in lowered]
+        return hits[:10]
+
+    async def aanalyze_symptoms(self, text: str) -> List[str]:
+        """
+        Extract symptom keywords from text (async variant)
+        
+        Args:
+            text: Symptom description text
+            
+        Returns:
+            List of symptom keywords
+        """
+        lexicon_hits = self._match_symptom_lexicon(text)
+        if lexicon_hits:
+            return lexicon_hits
+        result = await self.atext_generation(self._build_symptom_prompt(text), system_prompt=SYMPTOM_SYS_PROMPT)
+        return self._parse_symptom_result(result)
+
+    def _build_symptom_prompt(self, text: str) -> str:
+        """Build the dynamic user part of the symptom extraction prompt"""
+        return f"Patient description: {text}"
+
+    def _parse_symptom_result(self, result: str) -> List[str]:
+        """Parse the model output of symptom extraction"""
+        try:
+            symptoms = _parse_json(result)
             if isinstance(symptoms, list):
                 return [str(symptom).strip() for symptom in symptoms if symptom]
         except Exception as e:
@@ -222,49 +646,42 @@ Please directly return the symptom list:"""
                 "recommendations": ["Please provide more detailed symptom description for accurate assessment"]
             }
         
+        result = self.text_generation(self._build_risk_prompt(symptoms, medical_info), system_prompt=RISK_SYS_PROMPT)
+        return self._parse_risk_result(result)
+
+    async def aanalyze_risk(self, symptoms: List[str], medical_info: Dict = None) -> Dict:
+        """
+        Analyze risk level (async variant)
+        
+        Args:
+            symptoms: List of symptoms
+            medical_info: Relevant medical information
+            
+        Returns:
+            Risk assessment result dictionary
+        """
+        if not symptoms:
+            return {
+                "risk_level": 1,
+                "urgency": "Please describe symptoms in detail",
+                "recommendations": ["Please provide more detailed symptom description for accurate assessment"]
+            }
+        
+        result = await self.atext_generation(self._build_risk_prompt(symptoms, medical_info), system_prompt=RISK_SYS_PROMPT)
+        return self._parse_risk_result(result)
+
+    def _build_risk_prompt(self, symptoms: List[str], medical_info: Dict = None) -> str:
+        """Build the dynamic user part of the risk assessment prompt"""
         medical_context = ""
         if medical_info and medical_info.get("documents"):
             medical_context = f"\nRelevant medical knowledge: {medical_info}"
         
-        prompt = f"""Please act as a professional medical risk assessment expert and evaluate the patient's risk level based on the following information:
-
-Symptom list: {', '.join(symptoms)}
-{medical_context}
-
-Please return the assessment result in Python dictionary format, including the following fields:
-- risk_level: Integer from 1-5 (1=very low risk, 2=low risk, 3=medium risk, 4=high risk, 5=urgent)
-- urgency: Medical consultation recommendation (e.g.: "Recommend observation", "Routine clinic visit", "Emergency visit", "Immediate medical attention")
-- recommendations: List of recommendations (3-5 specific suggestions)
-
-Example format:
-{{
-    "risk_level": 3,
-    "urgency": "Recommend routine clinic visit",
-    "recommendations": [
-        "It is advisable to seek medical examination in a timely manner",
-        "Rest appropriately and avoid overexertion", 
-        "Keep the affected area clean",
-        "Closely monitor symptom changes"
-    ]
-}}
+        return f"Symptom list: {', '.join(symptoms)}{medical_context}"
 
-Please directly return the dictionary:"""
-        
-        result = self.text_generation(prompt)
-        
+    def _parse_risk_result(self, result: str) -> Dict:
+        """Parse the model output of risk assessment"""
         try:
-            # Clean format
-            result = result.strip()
-            if result.startswith("```") and result.endswith("```"):
-                result = result[3:-3].strip()
-            if result.startswith("python") or result.startswith("json"):
-                result = result.split('\n', 1)[1].strip()
-            
-            # Attempt to parse JSON or Python dictionary
-            try:
-                return eval(result)
-            except:
-                return json.loads(result)
+            return _parse_json(result)
         except Exception as e:
             # Return default values if parsing fails
             return {
@@ -296,57 +713,42 @@ Please directly return the dictionary:"""
                 "lifestyle": ["Maintain a healthy lifestyle"]
             }
         
+        result = self.text_generation(self._build_plan_prompt(symptoms, medical_info), system_prompt=PLAN_SYS_PROMPT)
+        return self._parse_plan_result(result)
+
+    async def agenerate_treatment_plan(self, symptoms: List[str], medical_info: Dict = None) -> Dict:
+        """
+        Generate treatment recommendation plan (async variant)
+        
+        Args:
+            symptoms: List of symptoms
+            medical_info: Relevant medical information
+            
+        Returns:
+            Treatment plan dictionary
+        """
+        if not symptoms:
+            return {
+                "examinations": ["Please provide detailed symptom description first"],
+                "medications": ["Medication needs to be determined based on specific symptoms"],
+                "lifestyle": ["Maintain a healthy lifestyle"]
+            }
+        
+        result = await self.atext_generation(self._build_plan_prompt(symptoms, medical_info), system_prompt=PLAN_SYS_PROMPT)
+        return self._parse_plan_result(result)
+
+    def _build_plan_prompt(self, symptoms: List[str], medical_info: Dict = None) -> str:
+        """Build the dynamic user part of the treatment plan prompt"""
         medical_context = ""
         if medical_info and medical_info.get("documents"):
             medical_context = f"\nReference medical information: {medical_info}"
         
-        prompt = f"""Please act as a professional medical consultant and generate a treatment recommendation plan based on the following symptom information:
+        return f"Patient symptoms: {', '.join(symptoms)}{medical_context}"
 
-Patient symptoms: {', '.join(symptoms)}
-{medical_context}
-
-Please return the treatment plan in Python dictionary format, including the following fields:
-- examinations: List of recommended examination items (3-5 items)
-- medications: List of medication recommendations (Note: Only general recommendations can be given, not specific prescription drugs)
-- lifestyle: List of lifestyle recommendations (4-6 items)
-
-Example format:
-{{
-    "examinations": [
-        "Complete blood count test",
-        "Relevant specialist examinations",
-        "Imaging examinations"
-    ],
-    "medications": [
-        "Please take medication as prescribed by your doctor",
-        "Symptomatic treatment may be considered",
-        "Avoid self-medication"
-    ],
-    "lifestyle": [
-        "Adequate rest and avoid overexertion",
-        "Keep the affected area clean and hygienic",
-        "Eat light meals and drink plenty of water",
-        "Avoid irritating foods"
-    ]
-}}
-
-Please directly return the dictionary:"""
-        
-        result = self.text_generation(prompt)
-        
+    def _parse_plan_result(self, result: str) -> Dict:
+        """Parse the model output of treatment plan generation"""
         try:
-            # Clean format
-            result = result.strip()
-            if result.startswith("```") and result.endswith("```"):
-                result = result[3:-3].strip()
-            if result.startswith("python") or result.startswith("json"):
-                result = result.split('\n', 1)[1].strip()
-            
-            # Attempt to parse
-            try:
-                return eval(result)
-            except:
-                return json.loads(result)
+            return _parse_json(result)
         except Exception as e:
             # Return default plan if parsing fails
             return {
@@ -369,6 +771,175 @@ Please directly return the dictionary:"""
                 ]
             }
     
+    def full_consult(self, text: str, medical_info: Dict = None) -> Dict:
+        """
+        Run symptom extraction, risk assessment, and treatment planning
+        in a single model round-trip
+        
+        The staged pipeline pays network plus prefill latency three times;
+        batching the three sections into one prompt returns everything in
+        one call. Intended for single-shot callers that do not need the
+        staged/streamed outputs of the agent pipeline.
+        
+        Args:
+            text: Patient description text
+            medical_info: Relevant medical information
+            
+        Returns:
+            Dictionary with "symptoms", "risk", and "plan" sections in the
+            same shapes as the individual analysis methods
+        """
+        result = self.text_generation(self._build_full_consult_prompt(text, medical_info))
+        return self._parse_full_consult_result(result)
+
+    async def afull_consult(self, text: str, medical_info: Dict = None) -> Dict:
+        """
+        Single round-trip consultation (async variant of full_consult)
+        
+        Args:
+            text: Patient description text
+            medical_info: Relevant medical information
+            
+        Returns:
+            Dictionary with "symptoms", "risk", and "plan" sections
+        """
+        result = await self.atext_generation(self._build_full_consult_prompt(text, medical_info))
+        return self._parse_full_consult_result(result)
+
+    def _build_full_consult_prompt(self, text: str, medical_info: Dict = None) -> str:
+        """Build the combined three-section consultation prompt"""
+        medical_context = ""
+        if medical_info:
+            medical_context = f"\nRelevant medical knowledge: {medical_info}"
+        
+        return f"""Please act as a professional medical assistant and analyze the following patient description in three parts.
+
+Patient description: {text}
+{medical_context}
+
+Return one JSON object with exactly these three keys:
+- "symptoms": list of at most 10 concise symptom terms extracted from the description
+- "risk": object with "risk_level" (integer 1-5), "urgency" (consultation recommendation), and "recommendations" (list of 3-5 suggestions)
+- "plan": object with "examinations", "medications", and "lifestyle" (each a list of suggestions)
+
+Use strict JSON with double quotes and no additional explanatory text.
+
+Please directly return the JSON object:"""
+
+    def _parse_full_consult_result(self, result: str) -> Dict:
+        """Parse the combined consultation output into per-section shapes
+        
+        Each section falls back to the same defaults as the corresponding
+        individual parser, so a malformed section degrades exactly like a
+        failed single-purpose call.
+        """
+        sections = {}
+        try:
+            sections = _parse_json(result)
+            if not isinstance(sections, dict):
+                sections = {}
+        except Exception:
+            sections = {}
+        
+        symptoms = sections.get("symptoms")
+        if not isinstance(symptoms, list) or not symptoms:
+            symptoms = self._parse_symptom_result("")
+        else:
+            symptoms = [str(s).strip() for s in symptoms if s]
+        
+        risk = sections.get("risk")
+        if not isinstance(risk, dict):
+            risk = self._parse_risk_result("")
+        
+        plan = sections.get("plan")
+        if not isinstance(plan, dict):
+            plan = self._parse_plan_result("")
+        
+        return {
+            "symptoms": symptoms,
+            "risk": risk,
+            "plan": plan
+        }
+
+    def batch_analyze(self, cases: List[Dict]) -> str:
+        """
+        Submit backlogged cases for offline analysis via the Batch API
+        
+        Intended for non-interactive workloads such as nightly
+        re-analysis of stored patient descriptions: requests are shipped
+        as one JSONL file and processed within the 24h completion window
+        at batch pricing, outside the interactive rate-limit pool.
+        Completed batches can also prime the semantic response cache.
+        
+        Args:
+            cases: List of dicts with "id", "text", and optional
+                "medical_info" keys
+            
+        Returns:
+            Batch job id for use with poll_batch
+        """
+        lines = []
+        for case in cases:
+            lines.append(json.dumps({
+                "custom_id": str(case["id"]),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": "null",
+                    "messages": [{
+                        "role": "user",
+                        "content": self._build_full_consult_prompt(
+                            case["text"], case.get("medical_info"))
+                    }]
+                }
+            }, ensure_ascii=False))
+        
+        with tempfile.NamedTemporaryFile(
+            mode="w", suffix=".jsonl", encoding="utf-8", delete=False
+        ) as batch_file:
+            batch_file.write("\n".join(lines))
+            batch_path = batch_file.name
+        
+        try:
+            with open(batch_path, "rb") as f:
+                input_file = self.client.files.create(file=f, purpose="batch")
+            batch = self.client.batches.create(
+                input_file_id=input_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h"
+            )
+            return batch.id
+        finally:
+            os.unlink(batch_path)
+
+    def poll_batch(self, batch_id: str) -> Dict:
+        """
+        Check a batch job and fetch its parsed results when finished
+        
+        Args:
+            batch_id: Id returned by batch_analyze
+            
+        Returns:
+            {"status": ..., "results": {custom_id: parsed consult dict}}
+            where results is only present once the batch completed
+        """
+        batch = self.client.batches.retrieve(batch_id)
+        info = {"status": batch.status}
+        if batch.status == "completed" and batch.output_file_id:
+            content = self.client.files.content(batch.output_file_id)
+            results = {}
+            for line in content.text.splitlines():
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                body = entry.get("response", {}).get("body", {})
+                choices = body.get("choices") or []
+                if choices:
+                    results[entry["custom_id"]] = self._parse_full_consult_result(
+                        choices[0]["message"]["content"])
+            info["results"] = results
+        return info
+
     def test_connection(self) -> bool:
         """
         Test connection to ERNIE service
@@ -1,3 +1,5 @@
+from concurrent.futures import ThreadPoolExecutor
+
 from knowledge_base import KnowledgeBase
 
 def initialize_medical_knowledge():
@@ -9,10 +11,11 @@ def initialize_medical_knowledge():
         "Cough is an important defensive reflex action, which can be divided into acute cough and chronic cough.",
         "Fatigue is a subjective feeling of tiredness that may be associated with various diseases."
     ]
+    # "term" feeds the keyword lexicon used for LLM-free symptom matching
     symptoms_meta = [
-        {"type": "symptom", "severity": "medium"},
-        {"type": "symptom", "severity": "medium"},
-        {"type": "symptom", "severity": "low"}
+        {"type": "symptom", "severity": "medium", "term": "Fever"},
+        {"type": "symptom", "severity": "medium", "term": "Cough"},
+        {"type": "symptom", "severity": "low", "term": "Fatigue"}
     ]
     symptoms_ids = ["symptom_1", "symptom_2", "symptom_3"]
     
@@ -42,10 +45,16 @@ def initialize_medical_knowledge():
     ]
     treatments_ids = ["treatment_1", "treatment_2", "treatment_3"]
     
-    # Add to knowledge base
-    kb.add_medical_knowledge("symptoms", symptoms_docs, symptoms_meta, symptoms_ids)
-    kb.add_medical_knowledge("diseases", diseases_docs, diseases_meta, diseases_ids)
-    kb.add_medical_knowledge("treatments", treatments_docs, treatments_meta, treatments_ids)
+    # Add to knowledge base: the three collections are independent, and the
+    # embedding runtime releases the GIL, so loading them in parallel cuts
+    # cold-start roughly to the slowest single collection
+    batches = [
+        ("symptoms", symptoms_docs, symptoms_meta, symptoms_ids),
+        ("diseases", diseases_docs, diseases_meta, diseases_ids),
+        ("treatments", treatments_docs, treatments_meta, treatments_ids),
+    ]
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        list(executor.map(lambda args: kb.add_medical_knowledge(*args), batches))
 
 if __name__ == "__main__":
     initialize_medical_knowledge()
@@ -1,19 +1,161 @@
 import chromadb
+import numpy as np
+from chromadb.config import Settings
 from chromadb.utils import embedding_functions
+import functools
+import hashlib
 import json
 import os
+import sqlite3
+from collections import OrderedDict
+
+def _norm_query(text: str) -> str:
+    """Normalize a query string for cache keying"""
+    return text.lower().strip()
+
+@functools.cache
+def _default_embedding_function():
+    """Process-wide DefaultEmbeddingFunction singleton
+
+    The default embedder loads an ONNX model on construction; building
+    one per collection wastes both memory and cold-start time, so every
+    collection shares this lazily created instance.
+    """
+    return embedding_functions.DefaultEmbeddingFunction()
+
+class _FlatInt8Index:
+    """Brute-force int8 cosine search over a collection snapshot
+
+    The corpus is tiny (a handful of documents per collection), so an
+    HNSW traversal buys nothing: a flat int8 dot product over all rows is
+    both faster (SIMD int32 accumulation in numpy) and half the memory of
+    the fp32 vectors. Chroma stays the durable store; this is only the
+    query path, rebuilt lazily after every add.
+    """
+
+    def __init__(self, collection, embedding_function):
+        self.collection = collection
+        self.ef = embedding_function
+        self._vectors = None
+        self._documents = None
+        self._metadatas = None
+        self._ids = None
+
+    def invalidate(self):
+        """Drop the snapshot; next query rebuilds from the collection"""
+        self._vectors = None
+
+    @staticmethod
+    def _quantize(mat: np.ndarray) -> np.ndarray:
+        """Unit-normalize rows and quantize to int8 (scale 127)"""
+        norms = np.linalg.norm(mat, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return np.clip(np.rint(mat / norms * 127), -127, 127).astype(np.int8)
+
+    def _ensure_built(self) -> bool:
+        if self._vectors is not None:
+            return self._vectors.shape[0] > 0
+        try:
+            records = self.collection.get(include=["embeddings", "documents", "metadatas"])
+        except Exception as e:
+            print(f"⚠️ Flat index build failed: {str(e)}")
+            records = {}
+        embeddings = records.get("embeddings")
+        if embeddings is None or len(embeddings) == 0:
+            self._vectors = np.empty((0, 0), dtype=np.int8)
+            return False
+        self._vectors = self._quantize(np.asarray(embeddings, dtype=np.float32))
+        self._documents = records["documents"]
+        self._metadatas = records["metadatas"]
+        self._ids = records["ids"]
+        return True
+
+    def query(self, query_texts, n_results: int = 3):
+        """Chroma-shaped top-k result, or None when the snapshot is empty
+
+        Since both sides are unit-normalized before quantization, the
+        int32 dot product is cosine similarity scaled by 127^2; the
+        distances returned recover the usual cosine distance from it.
+        """
+        if not self._ensure_built():
+            return None
+        queries = self._quantize(np.asarray(self.ef(list(query_texts)), dtype=np.float32))
+        scores = self._vectors.astype(np.int32) @ queries.astype(np.int32).T
+        k = min(n_results, scores.shape[0])
+        out = {"documents": [], "metadatas": [], "ids": [], "distances": []}
+        for col in range(scores.shape[1]):
+            column = scores[:, col]
+            top = np.argpartition(-column, k - 1)[:k]
+            top = top[np.argsort(-column[top])]
+            out["documents"].append([self._documents[i] for i in top])
+            out["metadatas"].append([self._metadatas[i] for i in top])
+            out["ids"].append([self._ids[i] for i in top])
+            out["distances"].append([1.0 - (column[i] / (127.0 * 127.0)) for i in top])
+        return out
+
+class LLMSemanticCache:
+    """Embedding-based response cache for LLM calls
+
+    Near-identical prompts ("fever and cough for two days" vs "two days
+    of cough and fever") miss an exact-match cache but land within a
+    small cosine distance of each other. Completions are stored in a
+    dedicated Chroma collection and served back when a new prompt is
+    close enough to a cached one, skipping the LLM round-trip entirely.
+    """
+
+    # Cosine distance cutoff; 0.07 distance == cosine similarity >= 0.93
+    DISTANCE_THRESHOLD = 0.07
+
+    def __init__(self, client, embedding_function):
+        self.collection = client.get_or_create_collection(
+            name="llm_cache",
+            embedding_function=embedding_function,
+            metadata={"hnsw:space": "cosine"}
+        )
+
+    def get(self, prompt: str):
+        """Return the cached completion for a semantically close prompt, or None"""
+        try:
+            results = self.collection.query(query_texts=[prompt], n_results=1)
+            if results["ids"][0] and results["distances"][0][0] <= self.DISTANCE_THRESHOLD:
+                return results["metadatas"][0][0]["response"]
+        except Exception as e:
+            print(f"⚠️ Semantic cache lookup failed: {str(e)}")
+        return None
+
+    def set(self, prompt: str, response: str):
+        """Store a completion keyed by its prompt embedding"""
+        try:
+            self.collection.add(
+                documents=[prompt],
+                metadatas=[{"response": response}],
+                ids=[hashlib.blake2b(prompt.encode()).hexdigest()]
+            )
+        except Exception as e:
+            print(f"⚠️ Semantic cache store failed: {str(e)}")
 
 class KnowledgeBase:
+    # Documents embedded per add() call; keeps embedding batches bounded
+    _ADD_BATCH_SIZE = 256
+    # Bound on the per-instance query cache
+    _QUERY_CACHE_SIZE = 2048
+
     def __init__(self, persist_directory="medical_kb"):
         """
         Initialize the knowledge base, using a lightweight embedding function to avoid network download issues
         """
-        # Using the new ChromaDB 1.x API
-        self.client = chromadb.PersistentClient(path=persist_directory)
+        # Using the new ChromaDB 1.x API; telemetry off also skips its
+        # HTTP call at client startup
+        self.client = chromadb.PersistentClient(
+            path=persist_directory,
+            settings=Settings(anonymized_telemetry=False)
+        )
+        # Tune the backing SQLite store for interleaved add/query load
+        self._tune_sqlite(persist_directory)
         
         # Using ChromaDB's built-in default embedding function to avoid downloading large models
         # This function uses simple sentence embeddings and does not require downloading additional models
-        default_ef = embedding_functions.DefaultEmbeddingFunction()
+        default_ef = _default_embedding_function()
         
         # Create different types of knowledge base collections with specified embedding function
         self.symptoms_collection = self.client.get_or_create_collection(
@@ -28,7 +170,43 @@ class KnowledgeBase:
             name="treatments",
             embedding_function=default_ef
         )
+        # Semantic response cache for the LLM client; reuses the same
+        # Chroma client and embedder already loaded here
+        self.llm_cache = LLMSemanticCache(self.client, default_ef)
+        
+        # Read-mostly query cache: repeated lookups skip the embedding and
+        # HNSW search entirely. Invalidation reduces to clearing on add
+        self._query_cache = OrderedDict()
+        
+        # Flat int8 query indexes over the tiny corpora; Chroma remains
+        # the durable store and the fallback path
+        self._flat_diseases = _FlatInt8Index(self.diseases_collection, default_ef)
+        self._flat_treatments = _FlatInt8Index(self.treatments_collection, default_ef)
     
+    def _tune_sqlite(self, persist_directory: str):
+        """Apply performance PRAGMAs to Chroma's backing SQLite database
+
+        The defaults use fully synchronous writes; WAL journaling with
+        synchronous=NORMAL plus a generous mmap and page cache turns the
+        add/query interleaving from an fsync-bound path into a mostly
+        in-memory one. WAL and mmap_size persist in the database file,
+        the rest are per-connection hints.
+        """
+        db_path = os.path.join(persist_directory, "chroma.sqlite3")
+        if not os.path.exists(db_path):
+            return
+        try:
+            conn = sqlite3.connect(db_path)
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.execute("PRAGMA mmap_size=268435456")
+                conn.execute("PRAGMA cache_size=-65536")
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"⚠️ SQLite tuning skipped: {str(e)}")
+
     def add_medical_knowledge(self, collection_name: str, documents: list, metadatas: list, ids: list):
         """Add medical knowledge to the specified collection"""
         try:
@@ -40,31 +218,62 @@ class KnowledgeBase:
                 collection = self.treatments_collection
             else:
                 # Create new collection for new collection names
-                default_ef = embedding_functions.DefaultEmbeddingFunction()
                 collection = self.client.get_or_create_collection(
                     name=collection_name,
-                    embedding_function=default_ef
+                    embedding_function=_default_embedding_function()
                 )
             
-            collection.add(
-                documents=documents,
-                metadatas=metadatas,
-                ids=ids
-            )
+            # Pre-compute embeddings in bulk and hand them to Chroma, so
+            # the add path skips its own per-document embedding pass;
+            # chunked so a large future corpus never embeds in one giant
+            # forward pass
+            ef = _default_embedding_function()
+            for start in range(0, len(documents), self._ADD_BATCH_SIZE):
+                end = start + self._ADD_BATCH_SIZE
+                batch_docs = documents[start:end]
+                collection.add(
+                    documents=batch_docs,
+                    embeddings=ef(batch_docs),
+                    metadatas=metadatas[start:end],
+                    ids=ids[start:end]
+                )
+            # New documents can change any query's result set
+            self._query_cache.clear()
+            self._flat_diseases.invalidate()
+            self._flat_treatments.invalidate()
             print(f"✅ Successfully added {len(documents)} records to the {collection_name} collection")
             
         except Exception as e:
             print(f"❌ Failed to add medical knowledge: {str(e)}")
             raise
     
+    def _cache_get(self, key):
+        """Return a cached query result and refresh its LRU position"""
+        hit = self._query_cache.get(key)
+        if hit is not None:
+            self._query_cache.move_to_end(key)
+        return hit
+
+    def _cache_put(self, key, value):
+        """Store a query result, evicting the least recently used entry"""
+        self._query_cache[key] = value
+        self._query_cache.move_to_end(key)
+        while len(self._query_cache) > self._QUERY_CACHE_SIZE:
+            self._query_cache.popitem(last=False)
+
     def search_knowledge(self, collection_name: str, query: str, n_results: int = 5):
         """Search for relevant medical knowledge"""
+        key = ("search", collection_name, _norm_query(query), n_results)
+        hit = self._cache_get(key)
+        if hit is not None:
+            return hit
         try:
             collection = self.client.get_collection(collection_name)
             results = collection.query(
                 query_texts=[query],
                 n_results=n_results
             )
+            self._cache_put(key, results)
             return results
         except Exception as e:
             print(f"❌ Failed to search knowledge: {str(e)}")
@@ -75,12 +284,19 @@ class KnowledgeBase:
         if not symptoms:
             return {"documents": [[]], "metadatas": [[]], "ids": [[]]}
             
+        key = ("diseases", " ".join(sorted(_norm_query(s) for s in symptoms)))
+        hit = self._cache_get(key)
+        if hit is not None:
+            return hit
         try:
             query = " ".join(symptoms)
-            results = self.diseases_collection.query(
-                query_texts=[query],
-                n_results=3
-            )
+            results = self._flat_diseases.query([query], n_results=3)
+            if results is None:
+                results = self.diseases_collection.query(
+                    query_texts=[query],
+                    n_results=3
+                )
+            self._cache_put(key, results)
             return results
         except Exception as e:
             print(f"❌ Failed to query disease information: {str(e)}")
@@ -91,16 +307,109 @@ class KnowledgeBase:
         if not disease:
             return {"documents": [[]], "metadatas": [[]], "ids": [[]]}
             
+        key = ("treatment", _norm_query(disease))
+        hit = self._cache_get(key)
+        if hit is not None:
+            return hit
         try:
-            results = self.treatments_collection.query(
-                query_texts=[disease],
-                n_results=3
-            )
+            results = self._flat_treatments.query([disease], n_results=3)
+            if results is None:
+                results = self.treatments_collection.query(
+                    query_texts=[disease],
+                    n_results=3
+                )
+            self._cache_put(key, results)
             return results
         except Exception as e:
             print(f"❌ Failed to query treatment suggestions: {str(e)}")
             return {"documents": [[]], "metadatas": [[]], "ids": [[]]}
-    
+
+    def get_treatment_suggestions_batch(self, diseases: list) -> dict:
+        """Get treatment suggestions for several diseases in one query
+
+        Chroma embeds and searches all query texts in a single call, so
+        N diseases cost one round-trip instead of N. Returns a mapping of
+        disease -> per-disease result in the same shape as
+        get_treatment_suggestions.
+        """
+        diseases = [d for d in diseases if d]
+        if not diseases:
+            return {}
+
+        key = ("treatments_batch", tuple(_norm_query(d) for d in diseases))
+        hit = self._cache_get(key)
+        if hit is not None:
+            return hit
+
+        try:
+            results = self._flat_treatments.query(diseases, n_results=3)
+            if results is None:
+                results = self.treatments_collection.query(
+                    query_texts=diseases,
+                    n_results=3
+                )
+            mapped = {
+                disease: {
+                    "documents": [results["documents"][i]],
+                    "metadatas": [results["metadatas"][i]],
+                    "ids": [results["ids"][i]]
+                }
+                for i, disease in enumerate(diseases)
+            }
+            self._cache_put(key, mapped)
+            return mapped
+        except Exception as e:
+            print(f"❌ Failed to batch query treatment suggestions: {str(e)}")
+            return {disease: {"documents": [[]], "metadatas": [[]], "ids": [[]]} for disease in diseases}
+
+    def get_diseases_with_treatments(self, symptoms: list) -> dict:
+        """Resolve diseases and their treatment suggestions in one KB call
+
+        Fuses the symptom->disease search and the per-disease treatment
+        lookups that callers previously issued separately: one disease
+        vector query followed by one batched treatments query, instead of
+        the old 1 + N round-trips.
+        """
+        disease_info = self.get_disease_info(symptoms)
+
+        treatments = {}
+        if disease_info.get("documents") and disease_info["documents"][0]:
+            treatments = self.get_treatment_suggestions_batch(disease_info["documents"][0])
+
+        return {
+            "diseases": disease_info,
+            "treatments": treatments
+        }
+
+    def get_symptom_lexicon(self) -> list:
+        """Return known symptom terms for keyword-based extraction
+
+        Terms come from each record's "term" metadata when present; older
+        records without it fall back to the leading phrase of the document
+        ("Fever is a defensive response..." -> "Fever"). Whole documents
+        are never returned - they are full sentences that can never occur
+        as substrings of user input.
+        """
+        try:
+            records = self.symptoms_collection.get(include=["documents", "metadatas"])
+            documents = records.get("documents") or []
+            metadatas = records.get("metadatas") or [{}] * len(documents)
+            terms = []
+            for doc, meta in zip(documents, metadatas):
+                term = (meta or {}).get("term")
+                if not term and doc:
+                    head = doc.split(" is ", 1)[0].strip()
+                    # Only keep heads that are a genuine short lead-in, not
+                    # the whole sentence of a differently phrased document
+                    if head and head != doc.strip() and len(head) <= 40:
+                        term = head
+                if term:
+                    terms.append(term)
+            return terms
+        except Exception as e:
+            print(f"❌ Failed to load symptom lexicon: {str(e)}")
+            return []
+
     def get_collection_info(self):
         """Get basic information for all collections"""
         try:
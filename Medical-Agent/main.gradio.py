@@ -1,6 +1,14 @@
 import os
+import atexit
+import functools
+import io
+import itertools
 import logging
+import queue
+import threading
+import time
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
 import gradio as gr
 from dotenv import load_dotenv
 from agents import AgentCoordinator
@@ -8,48 +16,82 @@ from agents import AgentCoordinator
 # Load environment variables
 load_dotenv()
 
+# Log formats are fixed at import; building them inside setup_gradio_logging
+# made every call re-derive the same strings
+_LOG_FORMAT_DEBUG = '%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(funcName)s() - %(message)s'
+_LOG_FORMAT_STD = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+class BufferedFileHandler(logging.FileHandler):
+    """FileHandler that batches flushes instead of flushing per record.
+
+    StreamHandler.emit flushes after every record, which costs a syscall
+    per log line. Records are written to the stream buffer and only
+    flushed every _FLUSH_EVERY records - or immediately for WARNING and
+    above so problems hit disk right away. The queue listener's atexit
+    stop plus logging.shutdown drain the remainder on exit.
+    """
+    _FLUSH_EVERY = 64
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pending = 0
+
+    def emit(self, record):
+        try:
+            if self.stream is None:
+                self.stream = self._open()
+            msg = self.format(record)
+            self.stream.write(msg + self.terminator)
+            self._pending += 1
+            if record.levelno >= logging.WARNING or self._pending >= self._FLUSH_EVERY:
+                self.flush()
+                self._pending = 0
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
 # Configure Gradio logging
 def setup_gradio_logging():
     """Configure Gradio-specific logger - supports DEBUG mode"""
+    # Create Gradio-specific logger
+    gradio_logger = logging.getLogger('gradio_medical_app')
+    
+    # Already configured (module re-imported / setup called twice): reuse it.
+    # The old handlers.clear() leaked file descriptors and queue listeners
+    if gradio_logger.handlers:
+        return gradio_logger
+    
     # Create log directory
     os.makedirs("logs", exist_ok=True)
     
     # Check if DEBUG mode is enabled
     debug_mode = os.getenv('DEBUG', 'false').lower() in ['true', '1', 'yes', 'on']
     log_level = logging.DEBUG if debug_mode else logging.INFO
+    log_format = _LOG_FORMAT_DEBUG if debug_mode else _LOG_FORMAT_STD
     
-    # Configure log format
-    if debug_mode:
-        log_format = '%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(funcName)s() - %(message)s'
-    else:
-        log_format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    date_format = '%Y-%m-%d %H:%M:%S'
-    
-    # Create Gradio-specific logger
-    gradio_logger = logging.getLogger('gradio_medical_app')
     gradio_logger.setLevel(log_level)
     
-    # Clear existing handlers
-    gradio_logger.handlers.clear()
-    
-    # File handler - records all logs to file
-    file_handler = logging.FileHandler(
+    # File handler - records all logs to file (attached via the queue below)
+    file_handler = BufferedFileHandler(
         f"logs/gradio_app_{datetime.now().strftime('%Y%m%d')}.log", 
         encoding='utf-8'
     )
     file_handler.setLevel(log_level)
-    file_formatter = logging.Formatter(log_format, date_format)
+    file_formatter = logging.Formatter(log_format, _DATE_FORMAT)
     file_handler.setFormatter(file_formatter)
+    file_handlers = [file_handler]
     
     # DEBUG file handler - separate debug log file
     if debug_mode:
-        debug_handler = logging.FileHandler(
+        debug_handler = BufferedFileHandler(
             f"logs/debug_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log", 
             encoding='utf-8'
         )
         debug_handler.setLevel(logging.DEBUG)
         debug_handler.setFormatter(file_formatter)
-        gradio_logger.addHandler(debug_handler)
+        file_handlers.append(debug_handler)
     
     # Console handler - more details in DEBUG mode
     console_handler = logging.StreamHandler()
@@ -61,8 +103,15 @@ def setup_gradio_logging():
         console_formatter = logging.Formatter('%(levelname)s - %(message)s')
     console_handler.setFormatter(console_formatter)
     
-    # Add handlers
-    gradio_logger.addHandler(file_handler)
+    # File writes go through a queue to a background listener: request
+    # threads only enqueue records, disk latency stays off the hot path.
+    # The console handler stays direct since it is WARNING+ outside DEBUG
+    log_queue = queue.Queue(maxsize=10000)
+    gradio_logger.addHandler(QueueHandler(log_queue))
+    listener = QueueListener(log_queue, *file_handlers, respect_handler_level=True)
+    listener.start()
+    # Flush queued records on shutdown (including the KeyboardInterrupt path)
+    atexit.register(listener.stop)
     gradio_logger.addHandler(console_handler)
     
     # Log DEBUG mode status
@@ -78,19 +127,26 @@ def setup_gradio_logging():
 # Initialize logger
 logger = setup_gradio_logging()
 
+# Monotonic sequence for consultation log IDs; strftime-based IDs cost a
+# format parse per request and this is purely for log correlation
+_consultation_id_counter = itertools.count()
+
 class MedicalConsultation:
     def __init__(self):
         logger.info("Initializing intelligent medical consultation system")
         logger.debug("Creating MedicalConsultation instance")
         
         try:
-            logger.debug("Initializing AgentCoordinator...")
-            start_time = datetime.now()
-            self.coordinator = AgentCoordinator()
-            init_time = (datetime.now() - start_time).total_seconds()
-            
-            logger.info("AgentCoordinator initialized successfully")
-            logger.debug(f"AgentCoordinator initialization time: {init_time:.3f} seconds")
+            logger.debug("Obtaining shared AgentCoordinator instance...")
+            start_time = time.perf_counter()
+            # Reuse the process-wide coordinator so Gradio reloads and
+            # multiple UI sessions share one set of model/KB connections
+            self.coordinator = AgentCoordinator.instance()
+            self.coordinator.warmup()
+            init_time = time.perf_counter() - start_time
+
+            logger.info("AgentCoordinator ready (shared instance)")
+            logger.debug(f"AgentCoordinator acquisition + warmup time: {init_time:.3f} seconds")
             
             # Verify critical components of coordinator
             logger.debug("Verifying AgentCoordinator components...")
@@ -106,237 +162,313 @@ class MedicalConsultation:
 
     def format_results(self, consultation_results: dict) -> str:
         """Format diagnosis results"""
-        format_start_time = datetime.now()
-        logger.debug("Starting to format diagnosis results")
-        logger.debug(f"Input data structure: {type(consultation_results)}")
-        
+        format_start = time.perf_counter()
+        # isEnabledFor is checked once per call; the per-item debug lines
+        # below are free when DEBUG is off instead of formatting and dropping
+        _debug = logger.isEnabledFor(logging.DEBUG)
+        if _debug:
+            logger.debug("Starting to format diagnosis results")
+            logger.debug("Input data structure: %s", type(consultation_results))
+
         if not consultation_results:
             logger.warning("consultation_results is empty, cannot format")
             return "⚠️ No valid diagnosis results received"
-        
-        logger.debug(f"Keys in consultation_results: {list(consultation_results.keys())}")
-        
-        output = []
+
+        if _debug:
+            logger.debug("Keys in consultation_results: %s", list(consultation_results.keys()))
+
+        # Coerce the loosely typed result fields once up front; the section
+        # builders below can then rely on list/dict shapes without per-field
+        # isinstance ternaries
+        symptoms = consultation_results.get("symptoms", [])
+        if not isinstance(symptoms, list):
+            symptoms = []
+        risk = consultation_results.get("risk_assessment", {})
+        if not isinstance(risk, dict):
+            risk = {}
+        recommendations = risk.get("recommendations", [])
+        if not isinstance(recommendations, list):
+            recommendations = []
+        plan = consultation_results.get("treatment_plan", {})
+        if not isinstance(plan, dict):
+            plan = {}
+
+        # Single growing buffer instead of a list of fragments joined at
+        # the end; avoids holding every line object plus the joined copy
+        buf = io.StringIO()
+        write = buf.write
         sections_added = 0
-        
+
+        def _section(title, items, fallback, trailing_blank=True):
+            # Shared shape of the four list blocks: title, bullet per item
+            # (or a fallback bullet), one count debug instead of one per item
+            write(title + "\n")
+            if items:
+                for item in items:
+                    write(f"- {item}\n")
+            else:
+                write(fallback + "\n")
+            if trailing_blank:
+                write("\n")
+            if _debug:
+                logger.debug("%s %d items", title, len(items))
+
         # Add image analysis results
         image_analysis = consultation_results.get("image_analysis")
         if image_analysis:
-            logger.debug(f"Adding image analysis results (length: {len(str(image_analysis))})")
-            output.append("【Image Analysis】")
-            output.append(image_analysis)
-            output.append("")
+            # Stringify once; the debug line and the output body share it
+            ia_str = str(image_analysis)
+            if _debug:
+                logger.debug("Adding image analysis results (length: %d)", len(ia_str))
+            write("【Image Analysis】\n")
+            write(ia_str)
+            write("\n\n")
             sections_added += 1
             logger.info("Added image analysis results to output")
-        else:
+        elif _debug:
             logger.debug("No image analysis results")
-        
+
         # Add symptom analysis
-        symptoms = consultation_results.get("symptoms", [])
-        logger.debug(f"Symptom analysis data: {symptoms} (type: {type(symptoms)})")
-        
-        output.append("【Symptom Analysis】")
-        if isinstance(symptoms, list) and symptoms:
+        if _debug:
+            logger.debug("Symptom analysis data: %s (type: %s)", symptoms, type(symptoms))
+
+        write("【Symptom Analysis】\n")
+        if symptoms:
             symptoms_text = ", ".join(str(s) for s in symptoms)
-            output.append("Identified symptoms: " + symptoms_text)
-            logger.debug(f"Symptom text: {symptoms_text}")
+            write("Identified symptoms: " + symptoms_text + "\n")
+            if _debug:
+                logger.debug("Symptom text: %s", symptoms_text)
         else:
-            output.append("Identified symptoms: No specific symptoms")
-            logger.debug("Symptom list is empty or incorrectly formatted")
-        output.append("")
+            write("Identified symptoms: No specific symptoms\n")
+            if _debug:
+                logger.debug("Symptom list is empty or incorrectly formatted")
+        write("\n")
         sections_added += 1
-        logger.info(f"Identified {len(symptoms)} symptoms: {symptoms}")
-        
+        logger.info("Identified %d symptoms: %s", len(symptoms), symptoms)
+
         # Add risk assessment
-        risk = consultation_results.get("risk_assessment", {})
-        logger.debug(f"Risk assessment data: {risk} (type: {type(risk)})")
-        
-        risk_level = risk.get("risk_level", 0) if isinstance(risk, dict) else 0
-        urgency = risk.get("urgency", "Unknown") if isinstance(risk, dict) else "Unknown"
-        recommendations = risk.get("recommendations", []) if isinstance(risk, dict) else []
-        
-        logger.debug(f"Risk level: {risk_level}, Urgency: {urgency}, Number of recommendations: {len(recommendations)}")
-        
-        output.append("【Risk Assessment】")
-        output.append(f"Risk level: {'⚠️' * int(risk_level)} ({urgency})")
-        output.append("Recommendations:")
-        
-        if isinstance(recommendations, list):
-            for i, rec in enumerate(recommendations):
-                output.append(f"- {rec}")
-                logger.debug(f"Recommendation {i+1}: {rec}")
-        else:
-            output.append("- No specific recommendations")
-            logger.debug("recommendations is not in list format")
-            
-        output.append("")
+        if _debug:
+            logger.debug("Risk assessment data: %s (type: %s)", risk, type(risk))
+
+        risk_level = risk.get("risk_level", 0)
+        urgency = risk.get("urgency", "Unknown")
+
+        if _debug:
+            logger.debug("Risk level: %s, Urgency: %s, Number of recommendations: %d", risk_level, urgency, len(recommendations))
+
+        write("【Risk Assessment】\n")
+        write(f"Risk level: {'⚠️' * int(risk_level)} ({urgency})\n")
+        _section("Recommendations:", recommendations, "- No specific recommendations")
         sections_added += 1
-        logger.info(f"Risk assessment completed - Level: {risk_level}, Recommendation: {urgency}")
-        
+        logger.info("Risk assessment completed - Level: %s, Recommendation: %s", risk_level, urgency)
+
         # Add treatment plan
-        plan = consultation_results.get("treatment_plan", {})
-        logger.debug(f"Treatment plan data: {plan} (type: {type(plan)})")
-        
-        if isinstance(plan, dict):
-            examinations = plan.get("examinations", [])
-            medications = plan.get("medications", [])
-            lifestyle = plan.get("lifestyle", [])
-        else:
-            examinations = medications = lifestyle = []
-            logger.debug("treatment_plan is not in dictionary format")
-        
-        logger.debug(f"Number of recommended examinations: {len(examinations)}")
-        logger.debug(f"Number of medication recommendations: {len(medications)}")
-        logger.debug(f"Number of lifestyle recommendations: {len(lifestyle)}")
-        
+        if _debug:
+            logger.debug("Treatment plan data: %s (type: %s)", plan, type(plan))
+
+        examinations = plan.get("examinations", [])
+        medications = plan.get("medications", [])
+        lifestyle = plan.get("lifestyle", [])
+
         # Recommended examinations
-        output.append("【Recommended Examinations】")
-        if examinations:
-            for i, exam in enumerate(examinations):
-                output.append(f"- {exam}")
-                logger.debug(f"Examination {i+1}: {exam}")
-        else:
-            output.append("- No special examination recommendations")
-        output.append("")
+        _section("【Recommended Examinations】", examinations, "- No special examination recommendations")
         sections_added += 1
-        
+
         # Medication recommendations
-        output.append("【Medication Recommendations】")
-        if medications:
-            for i, med in enumerate(medications):
-                output.append(f"- {med}")
-                logger.debug(f"Medication recommendation {i+1}: {med}")
-        else:
-            output.append("- Please follow doctor's prescription")
-        output.append("")
+        _section("【Medication Recommendations】", medications, "- Please follow doctor's prescription")
         sections_added += 1
-        
+
         # Lifestyle recommendations
-        output.append("【Lifestyle Recommendations】")
-        if lifestyle:
-            for i, advice in enumerate(lifestyle):
-                output.append(f"- {advice}")
-                logger.debug(f"Lifestyle recommendation {i+1}: {advice}")
-        else:
-            output.append("- Get adequate rest and maintain healthy habits")
+        _section("【Lifestyle Recommendations】", lifestyle, "- Get adequate rest and maintain healthy habits",
+                 trailing_blank=False)
         sections_added += 1
-        
-        format_time = (datetime.now() - format_start_time).total_seconds()
-        result_text = "\n".join(output)
-        
-        logger.info(f"Treatment plan generated - Examinations: {len(examinations)}, Medications: {len(medications)}, Lifestyle advice: {len(lifestyle)}")
-        logger.debug(f"Formatting statistics:")
-        logger.debug(f"- Added {sections_added} result sections")
-        logger.debug(f"- Formatting time: {format_time:.3f} seconds")
-        logger.debug(f"- Final result length: {len(result_text)} characters")
-        logger.debug(f"- Result lines: {len(output)} lines")
-        logger.debug("Diagnosis results formatting completed")
-            
+
+        format_time = time.perf_counter() - format_start
+        result_text = buf.getvalue().rstrip("\n")
+
+        logger.info("Treatment plan generated - Examinations: %d, Medications: %d, Lifestyle advice: %d", len(examinations), len(medications), len(lifestyle))
+        if _debug:
+            logger.debug("Formatting statistics:")
+            logger.debug("- Added %d result sections", sections_added)
+            logger.debug("- Formatting time: %.3f seconds", format_time)
+            logger.debug("- Final result length: %d characters", len(result_text))
+            logger.debug("- Result lines: %d lines", result_text.count("\n") + 1)
+            logger.debug("Diagnosis results formatting completed")
+
         return result_text
 
     def process_consultation(self, image, symptoms: str) -> str:
         """Process consultation request"""
-        processing_start_time = datetime.now()
-        consultation_id = processing_start_time.strftime('%Y%m%d_%H%M%S_%f')[:17]
-        
-        # Log user request
-        user_info = {
-            "consultation_id": consultation_id,
-            "has_image": image is not None,
-            "image_path": image if image else None,
-            "symptoms_length": len(symptoms) if symptoms else 0,
-            "symptoms_preview": symptoms[:100] + "..." if symptoms and len(symptoms) > 100 else symptoms,
-            "timestamp": processing_start_time.isoformat()
-        }
-        logger.info(f"Received user consultation request: {user_info}")
-        logger.debug(f"[{consultation_id}] Detailed request information:")
-        logger.debug(f"[{consultation_id}] - Image: {'Yes' if image else 'No'}")
-        logger.debug(f"[{consultation_id}] - Symptom text: {repr(symptoms)}")
-        
+        # perf_counter for durations (monotonic, cheaper than datetime
+        # arithmetic); datetime only survives where a wall-clock string is shown
+        processing_start = time.perf_counter()
+        consultation_id = f"{next(_consultation_id_counter):08x}"
+        _debug = logger.isEnabledFor(logging.DEBUG)
+
+        # Log user request; the dict built here previously (with a preview
+        # slice and an isoformat timestamp) was assembled even when the line
+        # was filtered - the INFO record now carries only scalar fields
+        logger.info(
+            "Received consultation request id=%s has_image=%s sym_len=%d",
+            consultation_id, image is not None, len(symptoms) if symptoms else 0
+        )
+        if _debug:
+            symptoms_preview = symptoms[:100] + "..." if symptoms and len(symptoms) > 100 else symptoms
+            logger.debug("[%s] - Image path: %s", consultation_id, image)
+            logger.debug("[%s] - Symptom preview: %r", consultation_id, symptoms_preview)
+
         # Input validation
         if not symptoms and not image:
-            logger.warning(f"[{consultation_id}] User provided neither symptom description nor image")
-            logger.debug(f"[{consultation_id}] Input validation failed - no valid input")
+            logger.warning("[%s] User provided neither symptom description nor image", consultation_id)
+            if _debug:
+                logger.debug("[%s] Input validation failed - no valid input", consultation_id)
             return "Please provide symptom description or upload an image"
-        
+
         try:
-            logger.info(f"[{consultation_id}] Starting to process consultation request")
-            logger.debug(f"[{consultation_id}] Calling coordinator.process_consultation...")
-            
-            # Log call parameters
-            call_params = {
-                "text_input": symptoms or "",
-                "image_path": image,
-                "text_length": len(symptoms or ""),
-                "has_image": image is not None
-            }
-            logger.debug(f"[{consultation_id}] Call parameters: {call_params}")
-            
+            logger.info("[%s] Starting to process consultation request", consultation_id)
+            if _debug:
+                logger.debug("[%s] Calling coordinator.process_consultation...", consultation_id)
+                # Log call parameters
+                call_params = {
+                    "text_input": symptoms or "",
+                    "image_path": image,
+                    "text_length": len(symptoms or ""),
+                    "has_image": image is not None
+                }
+                logger.debug("[%s] Call parameters: %s", consultation_id, call_params)
+
             # Process consultation using Agent coordinator
-            coordination_start = datetime.now()
+            coordination_start = time.perf_counter()
             consultation_results = self.coordinator.process_consultation(
                 text_input=symptoms or "",
                 image_path=image
             )
-            coordination_time = (datetime.now() - coordination_start).total_seconds()
-            
-            logger.info(f"[{consultation_id}] Consultation processing completed, starting result formatting")
-            logger.debug(f"[{consultation_id}] Agent coordinator processing time: {coordination_time:.3f} seconds")
-            logger.debug(f"[{consultation_id}] Coordinator returned result structure: {list(consultation_results.keys()) if consultation_results else 'None'}")
-            
-            # Detailed logging of returned results
-            if consultation_results:
-                logger.debug(f"[{consultation_id}] Result details:")
-                for key, value in consultation_results.items():
-                    if isinstance(value, (str, int, float)):
-                        logger.debug(f"[{consultation_id}] - {key}: {value}")
-                    elif isinstance(value, (list, dict)):
-                        logger.debug(f"[{consultation_id}] - {key}: {type(value).__name__}(length={len(value)})")
-                    else:
-                        logger.debug(f"[{consultation_id}] - {key}: {type(value).__name__}")
-            
+            coordination_time = time.perf_counter() - coordination_start
+
+            logger.info("[%s] Consultation processing completed, starting result formatting", consultation_id)
+            if _debug:
+                logger.debug("[%s] Agent coordinator processing time: %.3f seconds", consultation_id, coordination_time)
+                logger.debug("[%s] Coordinator returned result structure: %s", consultation_id, list(consultation_results.keys()) if consultation_results else 'None')
+
+            # Summarize returned results in one record instead of one line
+            # per key (each line pays the full handler/formatter round trip)
+            if _debug and consultation_results:
+                shape = {
+                    key: value if isinstance(value, (str, int, float))
+                    else f"{type(value).__name__}(length={len(value)})" if isinstance(value, (list, dict))
+                    else type(value).__name__
+                    for key, value in consultation_results.items()
+                }
+                logger.debug("[%s] Result details: %s", consultation_id, shape)
+
             # Format output results
-            formatting_start = datetime.now()
+            formatting_start = time.perf_counter()
             formatted_result = self.format_results(consultation_results)
-            formatting_time = (datetime.now() - formatting_start).total_seconds()
-            
-            total_time = (datetime.now() - processing_start_time).total_seconds()
-            
-            logger.info(f"[{consultation_id}] Consultation request processed successfully")
-            logger.debug(f"[{consultation_id}] Performance statistics:")
-            logger.debug(f"[{consultation_id}] - Coordinator processing: {coordination_time:.3f} seconds")
-            logger.debug(f"[{consultation_id}] - Result formatting: {formatting_time:.3f} seconds")
-            logger.debug(f"[{consultation_id}] - Total time: {total_time:.3f} seconds")
-            logger.debug(f"[{consultation_id}] - Result length: {len(formatted_result)} characters")
-            
+            formatting_time = time.perf_counter() - formatting_start
+
+            total_time = time.perf_counter() - processing_start
+
+            logger.info("[%s] Consultation request processed successfully", consultation_id)
+            if _debug:
+                logger.debug(
+                    "[%s] Performance statistics: coordinator=%.3fs formatting=%.3fs total=%.3fs result_chars=%d",
+                    consultation_id, coordination_time, formatting_time, total_time, len(formatted_result)
+                )
+
             return formatted_result
-            
+
         except Exception as e:
-            error_time = (datetime.now() - processing_start_time).total_seconds()
+            error_time = time.perf_counter() - processing_start
             error_msg = f"System processing error: {str(e)}"
-            
-            logger.error(f"[{consultation_id}] Consultation processing failed: {str(e)}")
-            logger.debug(f"[{consultation_id}] Error occurred after: {error_time:.3f} seconds")
-            logger.debug(f"[{consultation_id}] Error type: {type(e).__name__}")
-            logger.debug(f"[{consultation_id}] Error details: {repr(e)}", exc_info=True)
+
+            logger.error("[%s] Consultation processing failed: %s", consultation_id, str(e))
+            if _debug:
+                logger.debug("[%s] Error occurred after: %.3f seconds", consultation_id, error_time)
+                logger.debug("[%s] Error type: %s", consultation_id, type(e).__name__)
+                logger.debug("[%s] Error details: %r", consultation_id, e, exc_info=True)
             
             return f"{error_msg}\n\nPlease check:\n1. Is the ERNIE service running properly (http://0.0.0.0:8180)\n2. Has the knowledge base been initialized\n3. Is the network connection working"
 
+    def stream_consultation(self, image, symptoms: str):
+        """Stream partially formatted results stage by stage
+
+        Generator twin of process_consultation: consumes the coordinator's
+        stage patches and yields the re-formatted output after each one, so
+        the UI fills in as soon as each pipeline stage finishes instead of
+        waiting for the whole chain.
+        """
+        processing_start = time.perf_counter()
+        consultation_id = f"{next(_consultation_id_counter):08x}"
+        _debug = logger.isEnabledFor(logging.DEBUG)
+
+        logger.info(
+            "Received streaming consultation request id=%s has_image=%s sym_len=%d",
+            consultation_id, image is not None, len(symptoms) if symptoms else 0
+        )
+
+        # Input validation
+        if not symptoms and not image:
+            logger.warning("[%s] User provided neither symptom description nor image", consultation_id)
+            yield "Please provide symptom description or upload an image"
+            return
+
+        consultation_results = {}
+        try:
+            stage_keys = self.coordinator._STAGE_RESULT_KEYS
+            for patch in self.coordinator.stream_consultation(
+                text_input=symptoms or "",
+                image_path=image
+            ):
+                key = stage_keys.get(patch.get("stage"))
+                if key is None:
+                    continue
+                consultation_results[key] = patch.get("data")
+                if _debug:
+                    logger.debug("[%s] Stage completed: %s (%.3fs elapsed)",
+                                 consultation_id, patch["stage"], time.perf_counter() - processing_start)
+                yield self.format_results(consultation_results)
+
+            logger.info("[%s] Streaming consultation completed in %.3f seconds",
+                        consultation_id, time.perf_counter() - processing_start)
+
+        except Exception as e:
+            logger.error("[%s] Consultation processing failed: %s", consultation_id, str(e))
+            if _debug:
+                logger.debug("[%s] Error details: %r", consultation_id, e, exc_info=True)
+            yield (f"System processing error: {str(e)}\n\nPlease check:\n"
+                   "1. Is the ERNIE service running properly (http://0.0.0.0:8180)\n"
+                   "2. Has the knowledge base been initialized\n"
+                   "3. Is the network connection working")
+
+# Serializes first-time construction; lru_cache alone does not stop two
+# threads racing through the initial miss
+_consultation_init_lock = threading.Lock()
+
+@functools.lru_cache(maxsize=1)
+def get_consultation() -> MedicalConsultation:
+    """Return the process-wide MedicalConsultation instance.
+
+    Gradio hot-reloads re-run create_ui; memoizing here keeps one
+    consultation frontend (and one warmed coordinator) per process.
+    """
+    with _consultation_init_lock:
+        return MedicalConsultation()
+
 def create_ui():
     """Create Gradio interface"""
     logger.info("Starting to create Gradio user interface")
     
     try:
-        consultation = MedicalConsultation()
-        logger.info("MedicalConsultation instance created successfully")
+        consultation = get_consultation()
+        logger.info("MedicalConsultation instance ready (shared)")
     except Exception as e:
         logger.error(f"Failed to create MedicalConsultation instance: {str(e)}")
         raise
     
     def log_user_interaction(image, symptoms):
-        """Log user interaction and process request"""
+        """Log user interaction and stream partial results"""
         logger.info("User started new consultation interaction")
-        return consultation.process_consultation(image, symptoms)
+        yield from consultation.stream_consultation(image, symptoms)
     
     with gr.Blocks(
         title="Intelligent Medical Consultation System",
@@ -405,6 +537,7 @@ def create_ui():
         
         # Bind event handlers
         def on_submit_click(image, symptoms):
+            interaction_start = time.perf_counter()
             interaction_time = datetime.now()
             session_id = interaction_time.strftime('%H%M%S_%f')[:9]
             
@@ -414,17 +547,20 @@ def create_ui():
             logger.debug(f"[UI-{session_id}] - Image: {'Yes' if image else 'No'}")
             logger.debug(f"[UI-{session_id}] - Symptom description length: {len(symptoms) if symptoms else 0}")
             
+            # Generator handler: Gradio streams each yield to the output
+            # box, so the worker shows progress instead of a frozen spinner
+            yield "⏳ Analyzing symptoms..."
             try:
-                result = log_user_interaction(image, symptoms)
-                processing_time = (datetime.now() - interaction_time).total_seconds()
+                for partial in log_user_interaction(image, symptoms):
+                    yield partial
+                processing_time = time.perf_counter() - interaction_start
                 logger.debug(f"[UI-{session_id}] Interface processing completed, time taken: {processing_time:.3f} seconds")
-                return result
             except Exception as e:
-                error_time = (datetime.now() - interaction_time).total_seconds()
+                error_time = time.perf_counter() - interaction_start
                 logger.error(f"[UI-{session_id}] Interface processing failed: {str(e)}")
                 logger.debug(f"[UI-{session_id}] Error occurred after: {error_time:.3f} seconds")
                 logger.debug(f"[UI-{session_id}] Error details: {repr(e)}", exc_info=True)
-                return f"Interface processing error: {str(e)}"
+                yield f"Interface processing error: {str(e)}"
         
         def on_clear_click():
             clear_time = datetime.now()
@@ -440,7 +576,8 @@ def create_ui():
             fn=on_submit_click,
             inputs=[image_input, symptoms_input],
             outputs=output,
-            show_progress=True
+            show_progress=True,
+            concurrency_limit=4
         )
         
         clear_btn.click(
@@ -453,7 +590,8 @@ def create_ui():
             fn=on_submit_click,
             inputs=[image_input, symptoms_input],
             outputs=output,
-            show_progress=True
+            show_progress=True,
+            concurrency_limit=4
         )
     
     logger.info("Gradio user interface created successfully")